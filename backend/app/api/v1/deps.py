@@ -4,6 +4,7 @@ from app.core.database import get_db
 from app.crud import user as user_crud
 from app.models.user import User
 from app.core.security import validate_init_data
+from app.services.user_cache import UserCache
 from typing import Optional
 
 async def get_current_user(
@@ -28,7 +29,11 @@ async def get_current_user(
     if not user_id:
         raise HTTPException(status_code=400, detail="Invalid user data")
 
-    # 2. Get or Create DB User
+    # 2. Get or Create DB User (recently seen users come from the cache)
+    user = await UserCache.get(db, user_id)
+    if user:
+        return user
+    generation = await UserCache.generation(user_id)
     user = await user_crud.get_user_by_telegram_id(db, user_id)
     if not user:
         # Auto-register
@@ -40,5 +45,6 @@ async def get_current_user(
             username=telegram_user.get("username"),
             photo_url=telegram_user.get("photo_url")
         )
+    await UserCache.put(user, generation)
         
     return user
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.services.game_service import GameService
+from app.services.game_engine import DIFFICULTY_LEVELS, DEFAULT_DIFFICULTY
 from app.services.telegram_bot import TelegramService
+from app.schemas.game_state import MoveRecord
 from pydantic import BaseModel
 import uuid
 from app.core.database import get_db
@@ -28,14 +30,16 @@ class EndGameResponse(BaseModel):
     loser_new_elo: int
 
 @router.post("/create", response_model=CreateGameResponse)
-async def create_game(type: str = "online"):
+async def create_game(type: str = "online", difficulty: str = DEFAULT_DIFFICULTY):
     game_id = str(uuid.uuid4())[:8] # Short ID
     service = GameService()
     
     is_bot_game = (type == "computer")
+    if is_bot_game and difficulty not in DIFFICULTY_LEVELS:
+        raise HTTPException(status_code=400, detail="Invalid difficulty level")
     
     # Initialize Game in Redis
-    await service.create_game(game_id, is_bot_game=is_bot_game)
+    await service.create_game(game_id, is_bot_game=is_bot_game, difficulty=difficulty)
     
     # Generate Telegram Invite Link
     if is_bot_game:
@@ -52,6 +56,14 @@ async def create_game(type: str = "online"):
 
     return CreateGameResponse(game_id=game_id, invite_link=invite_link)
 
+@router.get("/{game_id}/moves", response_model=list[MoveRecord])
+async def get_game_moves(game_id: str, start: int = 0):
+    """Moves played so far, for replays and PGN export."""
+    service = GameService()
+    if not await service.get_game_state(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    return await service.get_moves(game_id, max(start, 0))
+
 @router.post("/end", response_model=EndGameResponse)
 async def end_game(req: EndGameRequest, db: AsyncSession = Depends(get_db)):
     service = GameService()
@@ -4,6 +4,7 @@ from app.api.v1.deps import get_current_user
 from app.core.database import get_db
 from app.services.gamification_service import GamificationService
 from app.models.user import User
+from app.services.user_cache import UserCache
 
 router = APIRouter()
 
@@ -43,4 +44,5 @@ async def update_language(
     
     current_user.preferred_language = language
     await db.commit()
+    await UserCache.invalidate(current_user.telegram_id)
     return {"status": "success", "language": language}
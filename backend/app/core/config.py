@@ -17,9 +17,69 @@ class Settings(BaseSettings):
     # Redis
     # Default to localhost for dev. In production, use REDIS_URL environment variable.
     REDIS_URL: str = "redis://localhost:6379/0"
+    # Shared connection pool: size, seconds to wait for a free connection and
+    # seconds of idleness after which a connection is pinged before reuse
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: int = 5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    # Share Socket.IO rooms between processes through Redis (needed for more than one
+    # worker or replica, see app/core/socket.py) and the pub/sub channel used for it
+    SOCKETIO_REDIS_MANAGER: bool = False
+    SOCKETIO_REDIS_CHANNEL: str = "socketio"
+    # Let clients opt into msgpack-encoded game events (auth {'encoding': 'msgpack'})
+    SOCKETIO_MSGPACK: bool = True
+    # Most missed moves replayed to a reconnecting client before it gets the full state instead
+    RESUME_MAX_MOVES: int = 40
+
+    # Seconds a game's in-memory actor (mailbox and live board) survives without commands
+    GAME_ACTOR_IDLE_SECONDS: int = 300
+    # Games whose latest state and board each worker keeps in memory
+    HOT_GAME_CACHE_SIZE: int = 1000
+    # Finished games are recorded from a Redis stream: results per transaction, milliseconds
+    # a consumer waits for new ones, milliseconds before a failed or orphaned result is
+    # retried, and deliveries before it is moved to the dead-letter stream
+    RESULT_QUEUE_BATCH_SIZE: int = 50
+    RESULT_QUEUE_BLOCK_MS: int = 1000
+    RESULT_QUEUE_RETRY_MS: int = 30000
+    RESULT_QUEUE_MAX_ATTEMPTS: int = 5
+
+    # Computer opponent
+    # Ceilings applied on top of every difficulty level: per-move search budget
+    # in milliseconds and maximum iterative deepening depth
+    BOT_MOVE_TIME_MS: int = 1000
+    BOT_MAX_DEPTH: int = 8
+    # Transposition table entries per game and how many games a worker keeps tables for
+    BOT_TT_SIZE: int = 1 << 16
+    BOT_TT_MAX_GAMES: int = 16
+    # Search worker processes (0 runs searches on a thread of the web worker),
+    # how many searches may be queued or running, and extra time allowed per job
+    BOT_POOL_WORKERS: int = 2
+    BOT_POOL_MAX_PENDING: int = 16
+    BOT_POOL_TIMEOUT_GRACE_MS: int = 2000
+    # Search the expected reply while the human thinks
+    BOT_PONDER: bool = True
+    # Minimum time before the bot answers; the search runs during this delay
+    BOT_MIN_REPLY_MS: int = 800
+    # Polyglot opening book consulted before searching (disabled when unset)
+    OPENING_BOOK_PATH: str | None = None
+    OPENING_BOOK_MAX_PLY: int = 16
+    # Local Syzygy tables for perfect endgame play (disabled when unset).
+    # With SYZYGY_ADJUDICATE, games reaching a tablebase position end immediately with its result.
+    SYZYGY_PATH: str | None = None
+    SYZYGY_MAX_OPEN_FILES: int = 64
+    SYZYGY_ADJUDICATE: bool = False
 
     # Telegram
     TELEGRAM_BOT_TOKEN: str
+    # Seconds after its auth_date that WebApp initData is accepted (0 = no limit),
+    # and how long / how many validated initData strings are remembered
+    INIT_DATA_MAX_AGE: int = 60 * 60 * 24
+    INIT_DATA_CACHE_TTL: int = 300
+    INIT_DATA_CACHE_SIZE: int = 10000
+    # Authenticated users cached in Redis (seconds) and in each worker (seconds, count)
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_LOCAL_TTL: int = 5
+    USER_CACHE_SIZE: int = 10000
 
     # Security
     # In production, this MUST be set as an environment variable.
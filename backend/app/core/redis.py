@@ -0,0 +1,41 @@
+import logging
+from typing import Optional
+import redis.asyncio as redis
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# One pooled client per process, shared by every service that talks to Redis
+_client: Optional[redis.Redis] = None
+
+def init_redis() -> redis.Redis:
+    """Create the process-wide client. Called from the FastAPI lifespan."""
+    global _client
+    if _client is None:
+        # A blocking pool makes callers wait for a free connection instead of
+        # failing when REDIS_MAX_CONNECTIONS are all in use
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+        )
+        _client = redis.Redis(connection_pool=pool)
+        logger.info(f"✅ Redis pool created (max {settings.REDIS_MAX_CONNECTIONS} connections)")
+    return _client
+
+def get_redis() -> redis.Redis:
+    """
+    The shared client. Created on first use outside the app (scripts, tests).
+    Replies are raw bytes (game records are binary); decode text values at the call site.
+    """
+    return _client if _client is not None else init_redis()
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+        await client.connection_pool.disconnect()
+        logger.info("✅ Redis pool closed")
@@ -1,16 +1,29 @@
 import hmac
 import hashlib
 import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from urllib.parse import unquote
 from fastapi import HTTPException
 from app.core.config import get_settings
 
 settings = get_settings()
 
+# Recently validated initData strings by their hash: (initData, user data, expiry time).
+# A client sends the same initData with every request of its session.
+_validated: "OrderedDict[str, tuple[str, dict, float]]" = OrderedDict()
+
+@lru_cache(maxsize=1)
+def _secret_key(bot_token: str) -> bytes:
+    """HMAC key derived from the bot token, the same for every initData."""
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
 def validate_init_data(init_data: str) -> dict:
     """
     Validates the Telegram WebApp initData string using HMAC-SHA256.
     Returns the parsed user data dictionary if valid, raises HTTPException otherwise.
+    Valid strings are remembered for INIT_DATA_CACHE_TTL seconds (never past their expiry).
     """
     if not settings.TELEGRAM_BOT_TOKEN:
         raise HTTPException(status_code=500, detail="Bot token not configured")
@@ -18,6 +31,16 @@ def validate_init_data(init_data: str) -> dict:
     if not init_data:
         raise HTTPException(status_code=401, detail="Missing initData")
 
+    now = time.time()
+    # The hash is only a lookup key: it is chosen by the client, so the whole string must match
+    cache_key = next((part[5:] for part in init_data.split('&') if part.startswith('hash=')), None)
+    cached = _validated.get(cache_key)
+    if cached is not None and cached[0] == init_data:
+        if now < cached[2]:
+            _validated.move_to_end(cache_key)
+            return dict(cached[1])
+        del _validated[cache_key]
+
     try:
         # Parse initData string into a dictionary
         data_dict = {}
@@ -36,18 +59,29 @@ def validate_init_data(init_data: str) -> dict:
         data_check_string = '\n'.join(f'{k}={v}' for k, v in sorted(data_dict.items()))
 
         # Calculate HMAC-SHA256 signature
-        secret_key = hmac.new(b"WebAppData", settings.TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+        secret_key = _secret_key(settings.TELEGRAM_BOT_TOKEN)
         calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
 
-        if calculated_hash != received_hash:
+        if not hmac.compare_digest(calculated_hash, received_hash):
             raise HTTPException(status_code=403, detail="Invalid initData signature")
 
+        expires_at = now + settings.INIT_DATA_CACHE_TTL
+        if settings.INIT_DATA_MAX_AGE:
+            auth_expires_at = int(data_dict.get('auth_date', 0)) + settings.INIT_DATA_MAX_AGE
+            if auth_expires_at <= now:
+                raise HTTPException(status_code=401, detail="initData expired")
+            expires_at = min(expires_at, auth_expires_at)
+
         # Extract user data
         user_data_str = data_dict.get('user')
         if not user_data_str:
              raise HTTPException(status_code=400, detail="Missing user data in initData")
         
-        return json.loads(user_data_str)
+        user_data = json.loads(user_data_str)
+        _validated[cache_key] = (init_data, user_data, expires_at)
+        while len(_validated) > settings.INIT_DATA_CACHE_SIZE:
+            _validated.popitem(last=False)
+        return dict(user_data)
 
     except HTTPException:
         raise
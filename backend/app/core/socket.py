@@ -1,9 +1,33 @@
 import socketio
+from app.core.config import get_settings
+from app.core.redis import get_redis
+
+settings = get_settings()
+
+class SharedRedisManager(socketio.AsyncRedisManager):
+    """
+    Relays emits between server processes over Redis pub/sub, using the app's
+    shared connection pool instead of opening a separate client.
+    """
+
+    def _redis_connect(self):
+        self.redis = get_redis()
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.connected = True
+
+# With several uvicorn workers (WEB_CONCURRENCY > 1) or replicas, enable
+# SOCKETIO_REDIS_MANAGER so emits to a room reach clients connected to any process.
+# Each Socket.IO session still lives in one process: the frontend connects with the
+# websocket transport only, which needs no sticky sessions. If HTTP long-polling is
+# ever enabled, the load balancer must pin a client to one process (cookie or IP
+# affinity), and several workers behind one port cannot be used.
+client_manager = SharedRedisManager(channel=settings.SOCKETIO_REDIS_CHANNEL) if settings.SOCKETIO_REDIS_MANAGER else None
 
 # Create a Socket.IO server
 sio = socketio.AsyncServer(
     async_mode='asgi',
-    cors_allowed_origins='*'
+    cors_allowed_origins='*',
+    client_manager=client_manager
 )
 
 # Create an ASGI app structure for Socket.IO
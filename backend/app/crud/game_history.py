@@ -1,9 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, update
+from sqlalchemy.dialects.postgresql import insert
 from app.models.game_history import GameHistory
+from app.models.user import User
+from app.services.user_cache import UserCache
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 async def create_game_history(
     db: AsyncSession,
@@ -46,6 +50,105 @@ async def create_game_history(
     await db.refresh(db_game)
     return db_game
 
+@dataclass
+class GameResult:
+    """A finished rated game waiting to be recorded."""
+    game_id: str
+    white_player_id: int
+    black_player_id: int
+    winner: Optional[str]
+    result_type: str
+    total_moves: int = 0
+    final_fen: Optional[str] = None
+    game_type: str = 'online'
+
+async def finalize_games(
+    db: AsyncSession,
+    results: List[GameResult],
+    rate: Callable[[int, int, float], int]
+) -> List[GameHistory]:
+    """
+    Record finished games and their players' new ELO and counters in one transaction.
+    Games are rated in the order given, so a player's later game starts from the earlier one's ELO.
+    rate(own_elo, opponent_elo, score) gives a player's new ELO.
+    Games already recorded and games with an unknown player are skipped (nothing is written
+    for them); returns the history rows inserted, in the order of `results`.
+    """
+    telegram_ids = {p for r in results for p in (r.white_player_id, r.black_player_id)}
+    # Locked in id order, so concurrent finalizations of games sharing a player cannot deadlock.
+    # A transaction finalizing the same game holds these locks until it commits, so the
+    # check for recorded games below sees its row.
+    rows = await db.execute(
+        select(User.id, User.telegram_id, User.elo, User.games_played, User.wins, User.losses, User.draws)
+        .where(User.telegram_id.in_(telegram_ids))
+        .order_by(User.id)
+        .with_for_update()
+    )
+    players = {row.telegram_id: row._asdict() for row in rows}
+    recorded = set(await db.scalars(
+        select(GameHistory.game_id).where(GameHistory.game_id.in_([r.game_id for r in results]))
+    ))
+
+    now = datetime.utcnow()
+    history_rows, changed = [], {}
+    for r in results:
+        white, black = players.get(r.white_player_id), players.get(r.black_player_id)
+        if r.game_id in recorded or not white or not black:
+            continue
+        recorded.add(r.game_id)
+
+        score_white = {'w': 1.0, 'b': 0.0}.get(r.winner, 0.5)
+        white_elo = rate(white['elo'], black['elo'], score_white)
+        black_elo = rate(black['elo'], white['elo'], 1.0 - score_white)
+        history_rows.append(dict(
+            game_id=r.game_id,
+            white_player_id=r.white_player_id,
+            black_player_id=r.black_player_id,
+            winner=r.winner,
+            result_type=r.result_type,
+            white_elo_before=white['elo'],
+            white_elo_after=white_elo,
+            black_elo_before=black['elo'],
+            black_elo_after=black_elo,
+            total_moves=r.total_moves,
+            final_fen=r.final_fen,
+            game_type=r.game_type,
+            created_at=now,
+            ended_at=now
+        ))
+        for player, new_elo, score in ((white, white_elo, score_white), (black, black_elo, 1.0 - score_white)):
+            player['elo'] = new_elo
+            player['games_played'] += 1
+            player['wins' if score == 1.0 else 'losses' if score == 0.0 else 'draws'] += 1
+            changed[player['telegram_id']] = player
+
+    if not history_rows:
+        await db.rollback()
+        return []
+
+    # RETURNING gives no guaranteed row order, so rows are matched back by game_id
+    inserted = {history.game_id: history for history in await db.scalars(
+        insert(GameHistory)
+        .values(history_rows)
+        .on_conflict_do_nothing(index_elements=[GameHistory.game_id])
+        .returning(GameHistory)
+    )}
+    if len(inserted) != len(history_rows):
+        # Should not happen under the user locks; keep ratings consistent with the history
+        await db.rollback()
+        raise RuntimeError("Game history changed during finalization")
+    histories = [inserted[row['game_id']] for row in history_rows]
+
+    # One executemany UPDATE by primary key for every player involved
+    await db.execute(update(User), [
+        {key: player[key] for key in ('id', 'elo', 'games_played', 'wins', 'losses', 'draws')}
+        for player in changed.values()
+    ])
+    await db.commit()
+    for telegram_id in changed:
+        await UserCache.invalidate(telegram_id)
+    return histories
+
 async def get_user_recent_games(db: AsyncSession, telegram_id: int, limit: int = 10) -> List[GameHistory]:
     """Get recent games for a user."""
     result = await db.execute(
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.user import User
+from app.services.user_cache import UserCache
 from datetime import datetime
 
 async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int):
@@ -30,6 +31,7 @@ async def update_subscription(db: AsyncSession, user: User, tier: str, expires_a
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    await UserCache.invalidate(user.telegram_id)
     return user
 
 async def update_elo(db: AsyncSession, user: User, new_elo: int, result: str):
@@ -48,6 +50,7 @@ async def update_elo(db: AsyncSession, user: User, new_elo: int, result: str):
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    await UserCache.invalidate(user.telegram_id)
     return user
 
 async def update_wallet_address(db: AsyncSession, user: User, wallet_address: str):
@@ -55,6 +58,7 @@ async def update_wallet_address(db: AsyncSession, user: User, wallet_address: st
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    await UserCache.invalidate(user.telegram_id)
     return user
 
 async def get_top_users(db: AsyncSession, limit: int = 50):
@@ -10,6 +10,11 @@ import app.socket_events # Register events
 import os
 import logging
 from app.services.telegram_bot import TelegramService
+from app.services.bot_pool import BotSearchPool
+from app.services.game_actor import GameActors
+from app.services.game_cache import HotGames
+from app.services.result_queue import GameResults
+from app.core.redis import init_redis, close_redis
 from app.core.logger import setup_logging, LoggingMiddleware
 from app.middleware.head_middleware import HeadMiddleware
 
@@ -37,10 +42,19 @@ async def lifespan(app: FastAPI):
          logger.error(f"❌ Database Connection Failed: {e}")
 
     # await init_db() # We now use Alembic migrations in Dockerfile for schema management
+    init_redis()
+    HotGames.start()
+    GameResults.start()
+    BotSearchPool.start()
     await TelegramService.start_bot()
     yield
     # Shutdown
     await TelegramService.stop_bot()
+    await GameActors.stop()
+    await GameResults.stop()
+    await BotSearchPool.stop()
+    await HotGames.stop()
+    await close_redis()
 
 def create_application() -> FastAPI:
     application = FastAPI(
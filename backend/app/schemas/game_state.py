@@ -14,9 +14,24 @@ class GameState(BaseModel):
     is_stalemate: bool
     is_game_over: bool
     winner: Optional[str] = None  # 'w', 'b', or None
+    termination: Optional[str] = None  # Set when the game ended by adjudication, e.g. 'tablebase'
     legal_moves: List[str]
+    last_move: Optional[str] = None  # UCI of the move that led to this position
     white_player_id: Optional[int] = None
     black_player_id: Optional[int] = None
+    difficulty: Optional[str] = None  # Computer opponent level, see DIFFICULTY_LEVELS
+    version: int = 0  # Incremented by every saved change, used for compare-and-set
+
+    @property
+    def ply(self) -> int:
+        """Half-moves played since the start position, read from the FEN."""
+        fields = self.fen.split(" ")
+        return 2 * (int(fields[5]) - 1) + (fields[1] == 'b')
+
+class MoveRecord(BaseModel):
+    ply: int  # 1 for White's first move
+    uci: str
+    timestamp: int  # Milliseconds since the epoch when the move was saved
 
 class JoinGameRequest(BaseModel):
     game_id: str
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional
+import chess
+from app.core.config import get_settings
+from app.services.game_engine import GameEngine, SearchResult, SearchLimits
+from app.services.transposition_table import get_game_table, discard_game_table
+from app.services.opening_book import get_opening_book
+from app.services.tablebase import get_tablebase
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class BotPoolUnavailable(Exception):
+    """The pool could not run the search in time (queue full or job timed out)."""
+
+# Shared with the workers: the token of the job each job slot belongs to. A job whose
+# slot no longer holds its token (cancelled, timed out or reused) stops at its next clock check.
+_job_tokens = None
+
+def _init_worker(job_tokens):
+    global _job_tokens
+    _job_tokens = job_tokens
+
+def run_search(game_id: str, fen: str, limits: SearchLimits, tt_size: int, tt_max_games: int,
+               book_path: Optional[str] = None, book_max_ply: int = 16,
+               syzygy_path: Optional[str] = None, syzygy_max_open_files: int = 64,
+               finished_games: tuple = (), job_slot: Optional[int] = None, job_token: int = 0) -> SearchResult:
+    """Entry point executed inside a pool worker process."""
+    # Tables live in the workers, so finished games are freed here
+    for finished in finished_games:
+        discard_game_table(finished)
+    should_stop = None
+    if job_slot is not None:
+        should_stop = lambda: _job_tokens[job_slot] != job_token
+    engine = GameEngine(
+        tt=get_game_table(game_id, size=tt_size, max_games=tt_max_games),
+        book=get_opening_book(book_path, max_ply=book_max_ply),
+        tablebase=get_tablebase(syzygy_path, max_open_files=syzygy_max_open_files)
+    )
+    engine.board = chess.Board(fen)
+    return engine.search(time_limit_ms=limits.time_limit_ms, max_depth=limits.max_depth, max_nodes=limits.max_nodes,
+                         should_stop=should_stop)
+
+class BotSearchPool:
+    """
+    Runs engine searches off the event loop.
+    Jobs go to a ProcessPoolExecutor (or a thread when BOT_POOL_WORKERS is 0).
+    At most BOT_POOL_MAX_PENDING jobs are queued or running at once, and each job
+    is bounded by its search budget plus BOT_POOL_TIMEOUT_GRACE_MS. A job that is
+    cancelled or times out stops its worker within TIME_CHECK_INTERVAL nodes.
+    """
+    executor: Optional[ProcessPoolExecutor] = None
+    _slots: Optional[asyncio.Semaphore] = None
+    _jobs: dict[str, asyncio.Future] = {}
+    # Jobs handed to the executor and not finished yet
+    _running = 0
+    # Free indexes of _job_tokens, one per job slot, and the last token handed out
+    _free_job_slots: list[int] = []
+    _last_token = 0
+    # game_id -> (fen being pondered, task searching it)
+    _ponders: dict[str, tuple[str, asyncio.Task]] = {}
+    # Recently finished games, sent along with every job so each worker frees their tables.
+    # Best effort: a worker that gets no job before a game leaves this window keeps the
+    # table until its own LRU (BOT_TT_MAX_GAMES) evicts it.
+    _finished: deque = deque(maxlen=settings.BOT_TT_MAX_GAMES)
+
+    @classmethod
+    def start(cls):
+        cls._start_executor()
+        cls._slots = asyncio.Semaphore(settings.BOT_POOL_MAX_PENDING)
+
+    @classmethod
+    def _tokens(cls):
+        global _job_tokens
+        if _job_tokens is None:
+            _job_tokens = multiprocessing.get_context("spawn").RawArray("q", settings.BOT_POOL_MAX_PENDING)
+            cls._free_job_slots = list(range(settings.BOT_POOL_MAX_PENDING))
+        return _job_tokens
+
+    @classmethod
+    def _start_executor(cls):
+        if cls.executor is None and settings.BOT_POOL_WORKERS > 0:
+            # Spawned workers do not inherit the event loop or open sockets of this process
+            cls.executor = ProcessPoolExecutor(
+                max_workers=settings.BOT_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(cls._tokens(),)
+            )
+            logger.info(f"✅ Bot search pool started with {settings.BOT_POOL_WORKERS} workers")
+
+    @classmethod
+    def _replace_executor(cls, broken: ProcessPoolExecutor):
+        """Swap a broken pool for a new one. The job slots are kept: running jobs still hold some."""
+        # Every job of the broken pool fails with it; only the first one replaces it
+        if cls.executor is not broken:
+            return
+        logger.error("Bot search pool is broken, restarting it")
+        broken.shutdown(wait=False, cancel_futures=True)
+        cls.executor = None
+        cls._start_executor()
+
+    @classmethod
+    async def stop(cls):
+        for _, task in cls._ponders.values():
+            task.cancel()
+        cls._ponders.clear()
+        for future in list(cls._jobs.values()):
+            future.cancel()
+        cls._jobs.clear()
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+            cls.executor = None
+            logger.info("✅ Bot search pool stopped")
+
+    @classmethod
+    def _workers(cls) -> int:
+        # Searches in threads share one core through the GIL
+        return settings.BOT_POOL_WORKERS if cls.executor is not None else 1
+
+    @classmethod
+    async def search(cls, game_id: str, fen: str, limits: SearchLimits,
+                     ponder: bool = False) -> Optional[SearchResult]:
+        """
+        Search a position for the given game.
+        Returns None if the job was cancelled, raises BotPoolUnavailable on overload.
+        A real search stops a ponder search when it would otherwise wait for its worker.
+        """
+        job_id = f"{game_id}:ponder" if ponder else game_id
+        if not ponder and cls._running >= cls._workers():
+            cls._yield_ponder()
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(settings.BOT_POOL_MAX_PENDING)
+        timeout = (limits.time_limit_ms + settings.BOT_POOL_TIMEOUT_GRACE_MS) / 1000
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        slots = cls._slots
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise BotPoolUnavailable("Bot search queue is full")
+
+        future = None
+        executor = cls.executor
+        tokens = cls._tokens()
+        job_slot = cls._free_job_slots.pop()
+        cls._last_token += 1
+        tokens[job_slot] = cls._last_token
+        cls._running += 1
+        try:
+            job = partial(run_search, game_id, fen, limits, settings.BOT_TT_SIZE, settings.BOT_TT_MAX_GAMES,
+                          settings.OPENING_BOOK_PATH, settings.OPENING_BOOK_MAX_PLY,
+                          settings.SYZYGY_PATH, settings.SYZYGY_MAX_OPEN_FILES,
+                          finished_games=tuple(cls._finished), job_slot=job_slot, job_token=cls._last_token)
+            try:
+                future = loop.run_in_executor(executor, job)
+                cls._jobs[job_id] = future
+                remaining = max(timeout - (loop.time() - started), 0)
+                return await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                raise BotPoolUnavailable(f"Bot search for {game_id} timed out")
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM killed); replace the pool for the next jobs
+                cls._replace_executor(executor)
+                raise BotPoolUnavailable(f"Bot search for {game_id} lost its worker")
+            except asyncio.CancelledError:
+                # Cancelled through stop(): report no result instead of failing the caller
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    return None
+                raise
+        finally:
+            # Stops the worker if the job is still running there
+            tokens[job_slot] = 0
+            cls._free_job_slots.append(job_slot)
+            cls._running -= 1
+            if future is not None and cls._jobs.get(job_id) is future:
+                del cls._jobs[job_id]
+            slots.release()
+
+    @classmethod
+    def discard(cls, game_id: str):
+        """Free the search memory of a finished game in the workers, with their next jobs."""
+        cls.stop_ponder(game_id)
+        cls._finished.append(game_id)
+
+    @classmethod
+    def start_ponder(cls, game_id: str, fen: str, limits: SearchLimits):
+        """
+        Search the position expected after the human's reply while they think.
+        Only started on an idle worker, and stopped as soon as a real search needs it.
+        """
+        cls.stop_ponder(game_id)
+        if cls._running >= cls._workers():
+            return
+        task = asyncio.create_task(cls._ponder(game_id, fen, limits))
+        cls._ponders[game_id] = (fen, task)
+
+    @classmethod
+    async def _ponder(cls, game_id: str, fen: str, limits: SearchLimits) -> Optional[SearchResult]:
+        try:
+            return await cls.search(game_id, fen, limits, ponder=True)
+        except BotPoolUnavailable:
+            return None
+
+    @classmethod
+    async def take_ponder(cls, game_id: str, fen: str) -> Optional[SearchResult]:
+        """Result of the ponder search if it was for this exact position, else None."""
+        entry = cls._ponders.pop(game_id, None)
+        if entry is None:
+            return None
+        ponder_fen, task = entry
+        if ponder_fen != fen:
+            task.cancel()
+            return None
+        return await task
+
+    @classmethod
+    def _yield_ponder(cls):
+        # A finished ponder holds no worker and may still be taken
+        for game_id, (_, task) in list(cls._ponders.items()):
+            if not task.done():
+                cls.stop_ponder(game_id)
+                return
+
+    @classmethod
+    def stop_ponder(cls, game_id: str) -> bool:
+        entry = cls._ponders.pop(game_id, None)
+        if entry is None:
+            return False
+        entry[1].cancel()
+        return True
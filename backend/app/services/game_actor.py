@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from app.core.config import get_settings
+from app.schemas.game_state import GameState
+from app.services.game_service import GameService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class GameActor:
+    """
+    Processes the commands of one game (joins, moves, bot turns, game end) strictly
+    one after another through a mailbox.
+    The latest state and live board stay in the worker's hot-game cache between
+    commands, so a move costs a single compare-and-set instead of a read and a write.
+    """
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.service = GameService()
+        self._mailbox: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def post(self, command: Callable[[], Awaitable]) -> asyncio.Future:
+        """Queue a command; the returned future resolves with its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._mailbox.put_nowait((command, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def post_background(self, command: Callable[[], Awaitable]) -> asyncio.Future:
+        """Queue a command nobody waits for; its failure is logged."""
+        future = self.post(command)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _log_failure(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Command for game {self.game_id} failed: {future.exception()!r}")
+
+    async def _run(self):
+        while True:
+            try:
+                command, future = await asyncio.wait_for(self._mailbox.get(), settings.GAME_ACTOR_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                # Nothing can be queued between the timeout and this check (no await in between)
+                if self._mailbox.empty():
+                    GameActors.evict(self)
+                    return
+                continue
+            if future.cancelled():
+                continue
+            try:
+                result = await command()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+                continue
+            if not future.cancelled():
+                future.set_result(result)
+
+    async def _changed(self, state: GameState):
+        await GameActors.broadcast(self.game_id, state)
+        if state.is_game_over:
+            # Recorded as the next command, after the move has been announced
+            self.post_background(lambda: self.service.finish_game(self.game_id, state))
+
+    # Commands
+
+    async def join(self, user_id: Optional[int]) -> Optional[GameState]:
+        """Assign the user to a free colour if any and return the current state."""
+        async def command():
+            if user_id:
+                return await self.service.join_game(self.game_id, user_id)
+            return await self.service.get_game_state(self.game_id)
+        return await self.post(command)
+
+    async def move(self, uci: str, user_id: Optional[int]) -> GameState:
+        """
+        Apply a player's move, broadcast it and queue the bot's reply in bot games.
+        Raises MoveError when rejected.
+        """
+        async def command():
+            state = await self.service.apply_move(self.game_id, uci, user_id)
+            await self._changed(state)
+            if not state.is_game_over and state.black_player_id == -1 and state.turn == 'b':
+                self.bot_turn(settings.BOT_MIN_REPLY_MS)
+            return state
+        return await self.post(command)
+
+    def bot_turn(self, min_delay_ms: int = 0) -> asyncio.Future:
+        """Queue the computer opponent's reply; it is broadcast when played."""
+        async def command():
+            state = await self.service.make_bot_move(self.game_id, min_delay_ms)
+            if state is None:
+                # Cancelled, or the game changed elsewhere while searching
+                return None
+            await self._changed(state)
+            return state
+        return self.post_background(command)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+class GameActors:
+    """Registry of the live game actors of this process."""
+    _actors: dict[str, GameActor] = {}
+    # Called inside the mailbox with every state change, so broadcasts keep the move order
+    _broadcast: Optional[Callable[[str, GameState], Awaitable]] = None
+
+    @classmethod
+    def get(cls, game_id: str) -> GameActor:
+        actor = cls._actors.get(game_id)
+        if actor is None:
+            actor = cls._actors[game_id] = GameActor(game_id)
+        return actor
+
+    @classmethod
+    def evict(cls, actor: GameActor):
+        if cls._actors.get(actor.game_id) is actor:
+            del cls._actors[actor.game_id]
+
+    @classmethod
+    def on_change(cls, callback: Callable[[str, GameState], Awaitable]):
+        cls._broadcast = callback
+
+    @classmethod
+    async def broadcast(cls, game_id: str, state: GameState):
+        if cls._broadcast is not None:
+            try:
+                await cls._broadcast(game_id, state)
+            except Exception as e:
+                logger.error(f"Broadcast for game {game_id} failed: {e}")
+
+    @classmethod
+    async def stop(cls):
+        for actor in cls._actors.values():
+            actor.stop()
+        cls._actors.clear()
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+import chess
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.schemas.game_state import GameState
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Every saved game change is published here as "<version>:<game_id>"
+GAME_UPDATES_CHANNEL = "game:updates"
+
+class HotGames:
+    """
+    Per-worker LRU of recently played games: the last saved GameState and the live
+    board reached by it, so the move path needs neither a Redis GET nor a FEN parse.
+    Entries are dropped when another worker publishes a newer version. A missed
+    message costs nothing worse than one failed compare-and-set and a re-read.
+    Invalidations are remembered as version watermarks, so a Redis read that started
+    before one cannot cache the state it replaced.
+    """
+    _games: "OrderedDict[str, tuple[GameState, chess.Board]]" = OrderedDict()
+    # game_id -> lowest version a cached copy may have (bounded like the games)
+    _watermarks: "OrderedDict[str, int]" = OrderedDict()
+    _listener: Optional[asyncio.Task] = None
+
+    @classmethod
+    def get(cls, game_id: str) -> Optional[tuple[GameState, chess.Board]]:
+        """Cached (state, board). Callers must copy before changing them."""
+        entry = cls._games.get(game_id)
+        if entry is not None:
+            cls._games.move_to_end(game_id)
+        return entry
+
+    @classmethod
+    def put(cls, game_id: str, state: GameState, board: Optional[chess.Board] = None):
+        """Cache a game, unless a newer version of it is cached or known to exist."""
+        entry = cls._games.get(game_id)
+        if entry is not None and entry[0].version > state.version:
+            return
+        if state.version < cls._watermarks.get(game_id, 0):
+            return
+        if board is None or board.fen() != state.fen:
+            board = chess.Board(state.fen)
+        cls._games[game_id] = (state, board)
+        cls._games.move_to_end(game_id)
+        while len(cls._games) > settings.HOT_GAME_CACHE_SIZE:
+            cls._games.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, game_id: str, version: Optional[int] = None):
+        """Drop a game, or only its copies older than `version`."""
+        entry = cls._games.get(game_id)
+        if version is None and entry is not None:
+            # Called when the cached copy turned out to be behind
+            version = entry[0].version + 1
+        if version is not None and version > cls._watermarks.get(game_id, 0):
+            cls._watermarks[game_id] = version
+            cls._watermarks.move_to_end(game_id)
+            while len(cls._watermarks) > settings.HOT_GAME_CACHE_SIZE:
+                cls._watermarks.popitem(last=False)
+        if entry is not None and (version is None or entry[0].version < version):
+            del cls._games[game_id]
+
+    @classmethod
+    def clear(cls):
+        cls._games.clear()
+        cls._watermarks.clear()
+
+    @classmethod
+    def start(cls):
+        if cls._listener is None:
+            cls._listener = asyncio.create_task(cls._listen())
+
+    @classmethod
+    async def stop(cls):
+        if cls._listener is not None:
+            cls._listener.cancel()
+            cls._listener = None
+        cls.clear()
+
+    @classmethod
+    async def _listen(cls):
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(GAME_UPDATES_CHANNEL)
+                # Updates may have been missed while unsubscribed
+                cls.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    version, _, game_id = message["data"].decode().partition(":")
+                    cls.invalidate(game_id, int(version))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Game cache invalidation listener failed: {e}. Reconnecting.")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
@@ -1,6 +1,46 @@
 import chess
-import random
+import chess.polyglot
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
 from app.schemas.game_state import GameState
+from app.services.evaluation import IncrementalEvaluator
+from app.services.opening_book import OpeningBook
+from app.services.tablebase import EndgameTablebase
+from app.services.transposition_table import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE_SCORE = 100000
+# Scores beyond this bound encode "mate in N plies"
+MATE_BOUND = MATE_SCORE - 1000
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget is exhausted, or it was stopped."""
+
+@dataclass
+class SearchResult:
+    best_move: Optional[str]
+    score: int = 0
+    depth: int = 0
+    nodes: int = 0
+    elapsed_ms: float = 0.0
+    from_book: bool = False
+    from_tablebase: bool = False
+    # Expected reply to best_move, used for pondering
+    ponder_move: Optional[str] = None
+
+@dataclass
+class SearchLimits:
+    max_depth: int
+    max_nodes: Optional[int]
+    time_limit_ms: int
+
+# Computer opponent strength, cheapest first
+DIFFICULTY_LEVELS = {
+    "easy": SearchLimits(max_depth=1, max_nodes=500, time_limit_ms=50),
+    "medium": SearchLimits(max_depth=3, max_nodes=20000, time_limit_ms=300),
+    "hard": SearchLimits(max_depth=8, max_nodes=None, time_limit_ms=1000),
+}
+DEFAULT_DIFFICULTY = "medium"
 
 class GameEngine:
     # Basic piece values for evaluation
@@ -13,20 +53,64 @@ class GameEngine:
         chess.KING: 20000
     }
 
-    def __init__(self):
+    # Search defaults, overridable per call
+    DEFAULT_TIME_LIMIT_MS = 1000
+    MAX_DEPTH = 64
+    # How many nodes between two clock reads
+    TIME_CHECK_INTERVAL = 1024
+    # Deepest ply tracked by the killer move table
+    MAX_PLY = 128
+
+    # Move ordering bands: hash move, then captures by MVV-LVA, then killers, then history
+    HASH_MOVE_SCORE = 1 << 30
+    CAPTURE_SCORE = 1 << 24
+    KILLER_SCORE = 1 << 20
+
+    def __init__(self, tt: Optional[TranspositionTable] = None, book: Optional[OpeningBook] = None,
+                 tablebase: Optional[EndgameTablebase] = None):
         self.board = chess.Board()
+        # Shared across searches of the same game when provided
+        self.tt = tt
+        self.book = book
+        self.tablebase = tablebase
+        self.nodes = 0
+        self.last_search: Optional[SearchResult] = None
+        self.evaluator: Optional[IncrementalEvaluator] = None
+        self._deadline = 0.0
+        self._max_nodes = 0
+        self._should_stop: Optional[Callable[[], bool]] = None
+        self.killers: list = []
+        self.history: list = []
 
     def get_state(self) -> GameState:
+        """
+        Build the GameState in a single pass.
+        Legal moves are generated once and every flag is derived from them,
+        instead of letting outcome()/is_checkmate()/is_stalemate() regenerate them.
+        """
+        board = self.board
+        legal_moves = [move.uci() for move in board.generate_legal_moves()]
+        is_check = board.is_check()
+        is_checkmate = is_check and not legal_moves
+        is_stalemate = not is_check and not legal_moves
+        # Same automatic endings as board.outcome(): no moves, dead position, 75-move rule, fivefold repetition
+        is_game_over = (not legal_moves or board.is_insufficient_material()
+                        or board.halfmove_clock >= 150 or board.is_fivefold_repetition())
+
+        winner = None
+        if is_checkmate:
+            winner = 'b' if board.turn == chess.WHITE else 'w'
+
         return GameState(
-            fen=self.board.fen(),
-            turn='w' if self.board.turn == chess.WHITE else 'b',
-            is_check=self.board.is_check(),
-            is_checkmate=self.board.is_checkmate(),
-            is_stalemate=self.board.is_stalemate(),
-            is_game_over=self.board.is_game_over(),
-            winner='w' if self.board.outcome() and self.board.outcome().winner == chess.WHITE else 
-                   ('b' if self.board.outcome() and self.board.outcome().winner == chess.BLACK else None),
-            legal_moves=[move.uci() for move in self.board.legal_moves]
+            fen=board.fen(),
+            turn='w' if board.turn == chess.WHITE else 'b',
+            is_check=is_check,
+            is_checkmate=is_checkmate,
+            is_stalemate=is_stalemate,
+            is_game_over=is_game_over,
+            winner=winner,
+            legal_moves=legal_moves,
+            last_move=board.peek().uci() if board.move_stack else None
         )
 
     def make_move(self, uci: str) -> bool:
@@ -46,39 +130,268 @@ class GameEngine:
         if self.board.is_stalemate() or self.board.is_insufficient_material():
             return 0
 
-        score = 0
-        for piece_type, value in self.PIECE_VALUES.items():
-            score += len(self.board.pieces(piece_type, chess.WHITE)) * value
-            score -= len(self.board.pieces(piece_type, chess.BLACK)) * value
-        
-        # Add a bit of randomness to avoid predictable play
-        score += random.randint(-10, 10)
-        return score
+        return IncrementalEvaluator(self.board).evaluate(chess.WHITE)
+
+    def _push(self, move: chess.Move):
+        self.evaluator.push(self.board, move)
+        self.board.push(move)
+
+    def _pop(self):
+        self.board.pop()
+        self.evaluator.pop()
+
+    def get_best_move(self, time_limit_ms: Optional[int] = None, max_depth: Optional[int] = None,
+                      max_nodes: Optional[int] = None) -> Optional[str]:
+        """Finds the best move with an iterative deepening alpha-beta search."""
+        return self.search(time_limit_ms, max_depth, max_nodes).best_move
+
+    def search(self, time_limit_ms: Optional[int] = None, max_depth: Optional[int] = None,
+               max_nodes: Optional[int] = None, should_stop: Optional[Callable[[], bool]] = None) -> SearchResult:
+        """
+        Iterative deepening negamax search.
+        Each iteration searches one ply deeper; when the time or node budget runs
+        out, or `should_stop` (polled along with the clock) returns True, the result
+        of the last completed iteration is returned.
+        """
+        start = time.perf_counter()
+        time_limit_ms = time_limit_ms if time_limit_ms is not None else self.DEFAULT_TIME_LIMIT_MS
+        max_depth = max_depth or self.MAX_DEPTH
+        self._deadline = start + time_limit_ms / 1000
+        self._max_nodes = max_nodes or float('inf')
+        self._should_stop = should_stop
+        self.nodes = 0
+
+        if self.book is not None:
+            book_move = self.book.choose_move(self.board)
+            if book_move is not None:
+                result = SearchResult(best_move=book_move.uci(), from_book=True,
+                                      elapsed_ms=(time.perf_counter() - start) * 1000)
+                self.last_search = result
+                return result
+
+        if self.tablebase is not None:
+            tablebase_move = self.tablebase.best_move(self.board)
+            if tablebase_move is not None:
+                result = SearchResult(best_move=tablebase_move.uci(), from_tablebase=True,
+                                      elapsed_ms=(time.perf_counter() - start) * 1000)
+                self.last_search = result
+                return result
 
-    def get_best_move(self) -> str:
-        """Finds the best move using a 1-level deep heuristic search."""
         legal_moves = list(self.board.legal_moves)
-        if not legal_moves:
+        result = SearchResult(best_move=legal_moves[0].uci() if legal_moves else None)
+        if len(legal_moves) <= 1:
+            result.elapsed_ms = (time.perf_counter() - start) * 1000
+            self.last_search = result
+            return result
+
+        if self.tt is None:
+            self.tt = TranspositionTable()
+        self.evaluator = IncrementalEvaluator(self.board)
+        self.killers = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+
+        # Start from the move a previous search of this position preferred
+        hash_move = self.tt.best_move(chess.polyglot.zobrist_hash(self.board))
+        legal_moves = self._order_moves(legal_moves, hash_move, 0)
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._search_root(legal_moves, depth)
+            except SearchTimeout:
+                break
+            result.best_move, result.score, result.depth = move.uci(), score, depth
+            # Search the best move first in the next iteration
+            legal_moves.remove(move)
+            legal_moves.insert(0, move)
+            if abs(score) >= MATE_BOUND:
+                break
+
+        result.ponder_move = self._expected_reply(result.best_move)
+        result.nodes = self.nodes
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_search = result
+        return result
+
+    def _expected_reply(self, uci: Optional[str]) -> Optional[str]:
+        """The reply the transposition table predicts after our move, if any."""
+        if not uci:
             return None
+        move = chess.Move.from_uci(uci)
+        self.board.push(move)
+        try:
+            reply = self.tt.best_move(chess.polyglot.zobrist_hash(self.board))
+            return reply.uci() if reply and self.board.is_legal(reply) else None
+        finally:
+            self.board.pop()
+
+    def _search_root(self, legal_moves: list, depth: int) -> tuple[int, chess.Move]:
+        alpha, beta = -MATE_SCORE, MATE_SCORE
+        best_move = legal_moves[0]
+        for move in legal_moves:
+            self._push(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                self._pop()
+            if score > alpha:
+                alpha, best_move = score, move
+        self.tt.store(chess.polyglot.zobrist_hash(self.board), depth, alpha, EXACT, best_move)
+        return alpha, best_move
 
+    def _stopped(self) -> bool:
+        if time.perf_counter() >= self._deadline:
+            return True
+        return self._should_stop is not None and self._should_stop()
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes >= self._max_nodes:
+            raise SearchTimeout()
+        if self.nodes % self.TIME_CHECK_INTERVAL == 0 and self._stopped():
+            raise SearchTimeout()
+
+        board = self.board
+        if board.halfmove_clock >= 100 or board.is_insufficient_material() or board.is_repetition(2):
+            return 0
+
+        # Never stand pat while in check
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.probe(key)
+        hash_move = None
+        if entry is not None:
+            _, entry_depth, entry_score, flag, hash_move = entry
+            if entry_depth >= depth:
+                entry_score = self._score_from_tt(entry_score, ply)
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        moves = list(board.legal_moves)
+        if not moves:
+            # Prefer the quickest mate, delay being mated
+            return -MATE_SCORE + ply if in_check else 0
+        moves = self._order_moves(moves, hash_move, ply)
+
+        original_alpha = alpha
         best_move = None
-        if self.board.turn == chess.WHITE:
-            max_eval = -float('inf')
-            for move in legal_moves:
-                self.board.push(move)
-                eval = self.evaluate_board()
-                self.board.pop()
-                if eval > max_eval:
-                    max_eval = eval
-                    best_move = move
-        else:
-            min_eval = float('inf')
-            for move in legal_moves:
-                self.board.push(move)
-                eval = self.evaluate_board()
-                self.board.pop()
-                if eval < min_eval:
-                    min_eval = eval
-                    best_move = move
+        for move in moves:
+            quiet = not self._is_capture(move) and not move.promotion
+            self._push(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self._pop()
+            if score >= beta:
+                if quiet:
+                    self._remember_quiet_cutoff(move, depth, ply)
+                self.tt.store(key, depth, self._score_to_tt(score, ply), LOWER, move)
+                return score
+            if score > alpha:
+                alpha, best_move = score, move
+
+        flag = EXACT if alpha > original_alpha else UPPER
+        self.tt.store(key, depth, self._score_to_tt(alpha, ply), flag, best_move)
+        return alpha
 
-        return best_move.uci() if best_move else legal_moves[0].uci()
+    def _quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """Search captures only until the position is quiet, to avoid horizon effects."""
+        self.nodes += 1
+        if self.nodes >= self._max_nodes:
+            raise SearchTimeout()
+        if self.nodes % self.TIME_CHECK_INTERVAL == 0 and self._stopped():
+            raise SearchTimeout()
+
+        stand_pat = self.evaluator.evaluate(self.board.turn)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        captures = self._order_moves(list(self.board.generate_legal_captures()), None, ply)
+        for move in captures:
+            self._push(move)
+            try:
+                score = -self._quiescence(-beta, -alpha, ply + 1)
+            finally:
+                self._pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _is_capture(self, move: chess.Move) -> bool:
+        board = self.board
+        return bool(board.occupied_co[not board.turn] & chess.BB_SQUARES[move.to_square]) or \
+            (move.to_square == board.ep_square and board.piece_type_at(move.from_square) == chess.PAWN)
+
+    def _order_moves(self, moves: list, hash_move: Optional[chess.Move], ply: int) -> list:
+        """Sort moves best first: hash move, MVV-LVA captures, killers, history."""
+        board = self.board
+        killers = self.killers[ply] if ply < self.MAX_PLY else (None, None)
+        history = self.history[board.turn]
+        them = board.occupied_co[not board.turn]
+        values = self.PIECE_VALUES
+
+        scored = []
+        for move in moves:
+            if move == hash_move:
+                score = self.HASH_MOVE_SCORE
+            elif them & chess.BB_SQUARES[move.to_square] or move.promotion:
+                victim = board.piece_type_at(move.to_square)
+                attacker = board.piece_type_at(move.from_square)
+                # Most valuable victim first, least valuable attacker breaks ties
+                score = self.CAPTURE_SCORE + (values[victim] if victim else 0) * 16 - values[attacker] // 100
+                if move.promotion:
+                    score += values[move.promotion]
+            elif move.to_square == board.ep_square and board.piece_type_at(move.from_square) == chess.PAWN:
+                score = self.CAPTURE_SCORE + values[chess.PAWN] * 16 - 1
+            elif move == killers[0] or move == killers[1]:
+                score = self.KILLER_SCORE
+            else:
+                score = history[move.from_square * 64 + move.to_square]
+            scored.append((score, move))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _remember_quiet_cutoff(self, move: chess.Move, depth: int, ply: int):
+        """Record a quiet move that caused a beta cutoff as killer and in the history table."""
+        if ply < self.MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1], killers[0] = killers[0], move
+        # The move is already popped, so the side to move is the one that played it
+        history = self.history[self.board.turn]
+        index = move.from_square * 64 + move.to_square
+        history[index] += depth * depth
+        if history[index] > self.KILLER_SCORE // 2:
+            # Age the whole table instead of letting it reach the killer band
+            self.history[self.board.turn] = [value // 2 for value in history]
+
+    @staticmethod
+    def _score_to_tt(score: int, ply: int) -> int:
+        """Mate scores are stored relative to the node, not the root."""
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _score_from_tt(score: int, ply: int) -> int:
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
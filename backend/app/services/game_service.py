@@ -1,175 +1,288 @@
+import asyncio
 import chess
 import math
-from app.services.game_engine import GameEngine
+from app.services.game_engine import GameEngine, SearchLimits, DIFFICULTY_LEVELS, DEFAULT_DIFFICULTY
+from app.services.bot_pool import BotSearchPool, BotPoolUnavailable
+from app.services.tablebase import get_tablebase
 from app.services.session_manager import SessionManager
-from app.schemas.game_state import GameState
+from app.services.game_cache import HotGames
+from app.services.result_queue import GameResults
+from app.crud.game_history import GameResult
+from app.schemas.game_state import GameState, MoveRecord
 from typing import Optional
-from app.core.database import get_db, AsyncSessionLocal
-from app.crud import user as user_crud
+from app.core.database import get_db
+from app.core.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class MoveError(Exception):
+    """A move was rejected; the message is shown to the player."""
 
 class GameService:
+    # Compare-and-set attempts before giving up on a contended game
+    CAS_ATTEMPTS = 3
+    # Budget of the search run on the event loop when the bot pool is overloaded
+    # (a few milliseconds; quiescence included)
+    FALLBACK_LIMITS = SearchLimits(max_depth=1, max_nodes=128, time_limit_ms=10)
+
     def __init__(self):
         self.session_manager = SessionManager()
 
-    async def create_game(self, game_id: str, is_bot_game: bool = False) -> GameState:
+    async def create_game(self, game_id: str, is_bot_game: bool = False, difficulty: str = DEFAULT_DIFFICULTY) -> GameState:
         """Initialize a new game and save to Redis."""
         engine = GameEngine() # Starts with new board
         state = engine.get_state()
         if is_bot_game:
             state.black_player_id = -1 # Special ID for bot
+            state.difficulty = difficulty
         await self.session_manager.save_game(game_id, state)
+        HotGames.put(game_id, state, engine.board)
         return state
 
+    async def _load(self, game_id: str) -> tuple[Optional[GameState], Optional[chess.Board], bool]:
+        """
+        Latest known state and live board of a game, and whether they came from the
+        hot cache (and so may be behind another worker's move).
+        """
+        entry = HotGames.get(game_id)
+        if entry is not None:
+            return entry[0], entry[1], True
+        state = await self.session_manager.get_game(game_id)
+        if state:
+            HotGames.put(game_id, state)
+        return state, None, False
+
+    async def _save(self, game_id: str, state: GameState, expected_version: int,
+                    board: Optional[chess.Board] = None, move: Optional[tuple[int, str]] = None) -> bool:
+        """Compare-and-set `state` (logging `move`) and keep it with its board as the hot copy."""
+        if await self.session_manager.compare_and_set(game_id, state, expected_version, move):
+            HotGames.put(game_id, state, board)
+            return True
+        HotGames.invalidate(game_id)
+        return False
+
+    async def get_moves(self, game_id: str, start: int = 0) -> list[MoveRecord]:
+        return await self.session_manager.get_moves(game_id, start)
+
     async def get_game_state(self, game_id: str) -> Optional[GameState]:
-        """Fetch current state from Redis."""
-        return await self.session_manager.get_game(game_id)
+        """Fetch current state from the hot cache or Redis."""
+        state, _, _ = await self._load(game_id)
+        return state
 
     async def join_game(self, game_id: str, user_id: int) -> Optional[GameState]:
         """Assign user to White or Black if available."""
-        state = await self.session_manager.get_game(game_id)
+        for _ in range(self.CAS_ATTEMPTS):
+            state, board, _ = await self._load(game_id)
+            if not state:
+                return None
+            # The cached copy is shared
+            state = state.model_copy()
+
+            changed = False
+            if not state.white_player_id:
+                state.white_player_id = user_id
+                changed = True
+            elif not state.black_player_id and state.white_player_id != user_id:
+                state.black_player_id = user_id
+                changed = True
+
+            # If it's a bot game, ensure player 1 is white or black correctly
+            # Usually player 1 is white in bot games for mobile simplicity
+
+            if not changed or await self._save(game_id, state, state.version, board):
+                return state
+        return None
+
+    def _play(self, state: Optional[GameState], board: Optional[chess.Board], uci: str,
+              user_id: Optional[int]) -> GameEngine:
+        """Validate a move against `state` and return an engine with it played."""
         if not state:
-            return None
-        
-        changed = False
-        if not state.white_player_id:
-            state.white_player_id = user_id
-            changed = True
-        elif not state.black_player_id and state.white_player_id != user_id:
-            state.black_player_id = user_id
-            changed = True
-        
-        # If it's a bot game, ensure player 1 is white or black correctly
-        # Usually player 1 is white in bot games for mobile simplicity
-        
-        if changed:
-            await self.session_manager.save_game(game_id, state)
-        
-        return state
+            raise MoveError("Game not found")
+        if state.is_game_over:
+            raise MoveError("Game is over")
 
-    async def make_move(self, game_id: str, uci: str) -> Optional[GameState]:
-        """Load state, apply move, save state. Returns new state if valid."""
-        # 1. Load from Redis
-        current_state = await self.session_manager.get_game(game_id)
-        if not current_state:
-            return None
+        # Validate Turn Authorization
+        if user_id is not None:
+            is_white = state.white_player_id == user_id
+            is_black = state.black_player_id == user_id
+            if not (is_white or is_black):
+                raise MoveError("You are not a player in this game")
+            if (state.turn == 'w' and not is_white) or (state.turn == 'b' and not is_black):
+                raise MoveError("Not your turn")
 
-        # 2. Reconstruct Board
-        board = chess.Board(current_state.fen)
+        # Play on a copy of the live board (its move stack lets repetitions be detected)
         engine = GameEngine()
-        engine.board = board # Inject state
-
-        # 3. Validate & Move
-        if engine.make_move(uci):
-            new_state = engine.get_state()
-            
-            # Preserve Players
-            new_state.white_player_id = current_state.white_player_id
-            new_state.black_player_id = current_state.black_player_id
-
-            # 4. Save to Redis
-            await self.session_manager.save_game(game_id, new_state)
-            
-            # 5. Handle Game Over in Background
-            if new_state.is_game_over:
-                import asyncio
-                asyncio.create_task(self.end_game(game_id, new_state))
-            
-            return new_state
-        
-        return None
+        engine.board = board.copy() if board is not None else chess.Board(state.fen)
+        if not engine.make_move(uci):
+            raise MoveError("Illegal move")
+        return engine
+
+    def _next_state(self, engine: GameEngine, current_state: GameState) -> GameState:
+        new_state = engine.get_state()
+        # Preserve Players
+        new_state.white_player_id = current_state.white_player_id
+        new_state.black_player_id = current_state.black_player_id
+        new_state.difficulty = current_state.difficulty
+        self.adjudicate(engine.board, new_state)
+        return new_state
+
+    async def make_move(self, game_id: str, uci: str, user_id: Optional[int] = None) -> GameState:
+        """
+        Validate and apply a move, then queue the game's result if it ended.
+        See apply_move for the arguments.
+        """
+        new_state = await self.apply_move(game_id, uci, user_id)
+        if new_state.is_game_over:
+            await self.finish_game(game_id, new_state)
+        return new_state
+
+    async def apply_move(self, game_id: str, uci: str, user_id: Optional[int] = None) -> GameState:
+        """
+        Validate and apply a move with compare-and-set, retrying if another move got in first.
+        When user_id is given the move must come from the player whose turn it is.
+        Raises MoveError with a message for the client when the move is rejected.
+        """
+        for _ in range(self.CAS_ATTEMPTS):
+            current_state, board, cached = await self._load(game_id)
+            try:
+                engine = self._play(current_state, board, uci, user_id)
+            except MoveError:
+                if not cached:
+                    raise
+                # The cached copy may be behind a move made through another worker
+                HotGames.invalidate(game_id)
+                continue
+
+            new_state = self._next_state(engine, current_state)
+            # Save unless the game changed since it was loaded
+            if await self._save(game_id, new_state, current_state.version, engine.board,
+                                (engine.board.ply(), new_state.last_move)):
+                return new_state
 
-    async def make_bot_move(self, game_id: str) -> Optional[GameState]:
-        """Calculates and applies the best move for the bot."""
-        current_state = await self.session_manager.get_game(game_id)
+        raise MoveError("Game is busy, please try again")
+
+    async def finish_game(self, game_id: str, state: GameState):
+        """Release the bot's search memory and queue the result of a finished game for recording."""
+        BotSearchPool.discard(game_id)
+        result = await self.game_result(game_id, state)
+        if result:
+            await GameResults.enqueue(result)
+
+    async def make_bot_move(self, game_id: str, min_delay_ms: int = 0) -> Optional[GameState]:
+        """
+        Calculates and applies the best move for the bot.
+        The move is not applied before min_delay_ms, but the search runs during that delay.
+        A game it ends is finished by the caller (the game's actor), as for apply_move.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        current_state, board, _ = await self._load(game_id)
         if not current_state or current_state.is_game_over:
             return None
 
-        board = chess.Board(current_state.fen)
-        engine = GameEngine()
-        engine.board = board
+        fen = current_state.fen
+        limits = self.get_search_limits(current_state.difficulty)
+        # Served instantly when the human played the reply we pondered on
+        result = await BotSearchPool.take_ponder(game_id, fen)
+        pondered = result is not None
+        if result is None:
+            try:
+                result = await BotSearchPool.search(game_id, fen, limits)
+            except BotPoolUnavailable as e:
+                # Play a cheap 1-ply move rather than stalling the game under load
+                logger.warning(f"{e}. Falling back to a shallow search for {game_id}")
+                engine = GameEngine()
+                engine.board = chess.Board(fen)
+                fallback = self.FALLBACK_LIMITS
+                result = engine.search(time_limit_ms=fallback.time_limit_ms, max_depth=fallback.max_depth,
+                                       max_nodes=fallback.max_nodes)
+        if result is None:
+            return None
+        logger.info(f"Bot search for {game_id}: move={result.best_move} ponder_hit={pondered} "
+                    f"book={result.from_book} depth={result.depth} nodes={result.nodes} "
+                    f"time={result.elapsed_ms:.0f}ms")
 
-        bot_move_uci = engine.get_best_move()
+        remaining = min_delay_ms / 1000 - (loop.time() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        engine = GameEngine()
+        engine.board = board.copy() if board is not None else chess.Board(fen)
+        bot_move_uci = result.best_move
         if bot_move_uci and engine.make_move(bot_move_uci):
-            new_state = engine.get_state()
-            new_state.white_player_id = current_state.white_player_id
-            new_state.black_player_id = current_state.black_player_id
+            new_state = self._next_state(engine, current_state)
+
+            # The game may have moved on while the search was running
+            if not await self._save(game_id, new_state, current_state.version, engine.board,
+                                    (engine.board.ply(), new_state.last_move)):
+                return None
 
-            await self.session_manager.save_game(game_id, new_state)
-            
-            if new_state.is_game_over:
-                await self.end_game(game_id, new_state)
+            if not new_state.is_game_over and settings.BOT_PONDER and result.ponder_move:
+                expected = chess.Move.from_uci(result.ponder_move)
+                if engine.board.is_legal(expected):
+                    # engine.board is now the hot cache's live board; leave it at the saved state
+                    predicted = engine.board.copy(stack=False)
+                    predicted.push(expected)
+                    BotSearchPool.start_ponder(game_id, predicted.fen(), limits)
 
             return new_state
         return None
 
+    def adjudicate(self, board: chess.Board, state: GameState):
+        """End the game early when the tablebase already decides the result."""
+        if state.is_game_over or not settings.SYZYGY_ADJUDICATE:
+            return
+        tablebase = get_tablebase(settings.SYZYGY_PATH, max_open_files=settings.SYZYGY_MAX_OPEN_FILES)
+        wdl = tablebase.probe_wdl(board) if tablebase else None
+        if wdl is None:
+            return
+
+        state.is_game_over = True
+        state.termination = 'tablebase'
+        # Cursed wins and blessed losses are draws under the 50-move rule
+        if wdl == 2:
+            state.winner = state.turn
+        elif wdl == -2:
+            state.winner = 'b' if state.turn == 'w' else 'w'
+
+    def get_search_limits(self, difficulty: Optional[str]) -> SearchLimits:
+        """Search budget of a difficulty level, capped by the server-wide ceilings."""
+        level = DIFFICULTY_LEVELS.get(difficulty) or DIFFICULTY_LEVELS[DEFAULT_DIFFICULTY]
+        return SearchLimits(
+            max_depth=min(level.max_depth, settings.BOT_MAX_DEPTH),
+            max_nodes=level.max_nodes,
+            time_limit_ms=min(level.time_limit_ms, settings.BOT_MOVE_TIME_MS)
+        )
+
     def calculate_new_elo(self, rating1: int, rating2: int, actual_score: float, k: int = 32) -> int:
         expected_score = 1 / (1 + 10 ** ((rating2 - rating1) / 400))
         return round(rating1 + k * (actual_score - expected_score))
 
-    async def end_game(self, game_id: str, state: GameState):
-        """Process game result and update ELO."""
-        async with AsyncSessionLocal() as session:
-            white_id = state.white_player_id
-            black_id = state.black_player_id
-            
-            # Fetch users
-            white_user = await user_crud.get_user_by_telegram_id(session, white_id) if white_id and white_id != -1 else None
-            black_user = await user_crud.get_user_by_telegram_id(session, black_id) if black_id and black_id != -1 else None
-
-            if not white_user or (not black_user and black_id != -1):
-                 # One player is missing or bot game (skip ELO for bot games for now)
-                 return
-
-            # Store current ELO before changes
-            white_elo_before = white_user.elo
-            black_elo_before = black_user.elo
-
-            # Determine Result
-            score_white = 0.5
-            if state.winner == 'w':
-                score_white = 1.0
-            elif state.winner == 'b':
-                score_white = 0.0
-            
-            # Calculate ELO change
-            new_white_elo = self.calculate_new_elo(white_user.elo, black_user.elo, score_white)
-            new_black_elo = self.calculate_new_elo(black_user.elo, white_user.elo, 1.0 - score_white)
-
-            # Update DB
-            if state.winner == 'w':
-                await user_crud.update_elo(session, white_user, new_white_elo, 'win')
-                await user_crud.update_elo(session, black_user, new_black_elo, 'loss')
-            elif state.winner == 'b':
-                await user_crud.update_elo(session, white_user, new_white_elo, 'loss')
-                await user_crud.update_elo(session, black_user, new_black_elo, 'win')
-            else:
-                 await user_crud.update_elo(session, white_user, new_white_elo, 'draw')
-                 await user_crud.update_elo(session, black_user, new_black_elo, 'draw')
-            
-            # Save game history
-            from app.crud import game_history as game_history_crud
-            
-            # Calculate total moves (approximate from FEN or board state)
-            total_moves = len(state.move_history) if hasattr(state, 'move_history') else 0
-            
-            # Determine result type
-            result_type = 'draw'
-            if state.winner:
-                result_type = 'checkmate'  # Can be enhanced later with resignation, timeout, etc.
-            
-            await game_history_crud.create_game_history(
-                db=session,
-                game_id=game_id,
-                white_player_id=white_id,
-                black_player_id=black_id,
-                winner=state.winner,
-                result_type=result_type,
-                white_elo_before=white_elo_before,
-                white_elo_after=new_white_elo,
-                black_elo_before=black_elo_before,
-                black_elo_after=new_black_elo,
-                total_moves=total_moves,
-                duration_seconds=None,  # Can be tracked later by storing game start time
-                final_fen=state.fen,
-                game_type='online'
-            )
+    async def game_result(self, game_id: str, state: GameState) -> Optional[GameResult]:
+        """What is recorded for a finished game; None for unrated games."""
+        white_id = state.white_player_id
+        black_id = state.black_player_id
+        if not white_id or not black_id or black_id == -1:
+            # One player is missing or bot game (skip ELO for bot games for now)
+            return None
+
+        # Determine result type
+        result_type = 'draw'
+        if state.termination:
+            result_type = state.termination
+        elif state.winner:
+            result_type = 'checkmate'  # Can be enhanced later with resignation, timeout, etc.
+
+        return GameResult(
+            game_id=game_id,
+            white_player_id=white_id,
+            black_player_id=black_id,
+            winner=state.winner,
+            result_type=result_type,
+            # Every applied move is in the game's move log
+            total_moves=await self.session_manager.count_moves(game_id),
+            final_fen=state.fen,
+            game_type='online'
+        )
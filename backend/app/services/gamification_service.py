@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from app.models.user import User
 from app.models.gamification import Task, UserTask, Referral, TaskType
+from app.services.user_cache import UserCache
 from datetime import datetime, timedelta
 import random
 import string
@@ -61,6 +62,7 @@ class GamificationService:
             # Trigger "Level Up" event/notification logic here
             
         await db.commit()
+        await UserCache.invalidate(user.telegram_id)
         return user
 
     @staticmethod
@@ -73,7 +75,10 @@ class GamificationService:
 
     @staticmethod
     async def process_referral(db: AsyncSession, new_user: User, referral_code: str):
-        result = await db.execute(select(User).where(User.referral_code == referral_code))
+        result = await db.execute(
+            select(User).where(User.referral_code == referral_code)
+            .with_for_update().execution_options(populate_existing=True)
+        )
         referrer = result.scalars().first()
         
         if referrer and referrer.id != new_user.id:
@@ -115,8 +120,10 @@ class GamificationService:
         # Mark as claimed
         user_task.claimed = True
         
-        # Award XP
-        user_result = await db.execute(select(User).where(User.id == user_id))
+        # Award XP. Reloaded and locked: the session may hold the cached user, and xp is incremented
+        user_result = await db.execute(
+            select(User).where(User.id == user_id).with_for_update().execution_options(populate_existing=True)
+        )
         user = user_result.scalars().first()
         
         updated_user = await GamificationService.add_xp(db, user, task_def.xp_reward)
@@ -0,0 +1,59 @@
+import logging
+import os
+import random
+from typing import Optional
+import chess
+import chess.polyglot
+
+logger = logging.getLogger(__name__)
+
+class OpeningBook:
+    """
+    Polyglot (.bin) opening book.
+    python-chess memory-maps the file and binary searches it by Zobrist key, so a
+    lookup costs a few microseconds and no search at all.
+    """
+
+    def __init__(self, path: str, max_ply: int = 16):
+        self.path = path
+        self.max_ply = max_ply
+        self._reader: Optional[chess.polyglot.MemoryMappedReader] = None
+        self._unavailable = False
+
+    def _open(self) -> Optional[chess.polyglot.MemoryMappedReader]:
+        if self._reader is None and not self._unavailable:
+            if not os.path.isfile(self.path):
+                logger.warning(f"Opening book not found at {self.path}. Bot will search from move one.")
+                self._unavailable = True
+                return None
+            self._reader = chess.polyglot.open_reader(self.path)
+        return self._reader
+
+    def choose_move(self, board: chess.Board, rng: Optional[random.Random] = None) -> Optional[chess.Move]:
+        """Pick a book move weighted by its book weight, or None when out of book."""
+        if board.ply() >= self.max_ply:
+            return None
+        reader = self._open()
+        if reader is None:
+            return None
+        try:
+            entry = reader.weighted_choice(board, random=rng)
+        except IndexError:
+            return None
+        return entry.move if board.is_legal(entry.move) else None
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+# One reader per book file in each process
+_books: dict[str, OpeningBook] = {}
+
+def get_opening_book(path: Optional[str], max_ply: int = 16) -> Optional[OpeningBook]:
+    if not path:
+        return None
+    book = _books.get(path)
+    if book is None:
+        book = _books[path] = OpeningBook(path, max_ply=max_ply)
+    return book
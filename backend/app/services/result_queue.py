@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+from redis.exceptions import ResponseError
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
+from app.crud import game_history as game_history_crud
+from app.crud.game_history import GameResult
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Finished games waiting to be recorded, consumed by every worker through one group
+RESULTS_STREAM = "game:results"
+RESULTS_GROUP = "finalizers"
+# Results that failed RESULT_QUEUE_MAX_ATTEMPTS times, kept for inspection
+DEAD_RESULTS_STREAM = "game:results:dead"
+
+def _encode(result: GameResult) -> dict:
+    return {
+        "game_id": result.game_id,
+        "white": result.white_player_id,
+        "black": result.black_player_id,
+        "winner": result.winner or "",
+        "result_type": result.result_type,
+        "total_moves": result.total_moves,
+        "fen": result.final_fen or "",
+        "game_type": result.game_type,
+    }
+
+def _decode(fields: dict) -> GameResult:
+    fields = {key.decode(): value.decode() for key, value in fields.items()}
+    return GameResult(
+        game_id=fields["game_id"],
+        white_player_id=int(fields["white"]),
+        black_player_id=int(fields["black"]),
+        winner=fields["winner"] or None,
+        result_type=fields["result_type"],
+        total_moves=int(fields["total_moves"]),
+        final_fen=fields["fen"] or None,
+        game_type=fields["game_type"],
+    )
+
+def _read_entries(reply) -> list:
+    """Entries of our one stream from an XREADGROUP reply (a RESP2 list or a RESP3 map)."""
+    if not reply:
+        return []
+    if isinstance(reply, dict):
+        return next(iter(reply.values()))[0]
+    return reply[0][1]
+
+class GameResults:
+    """
+    Durable write-behind queue for finished games: finish_game only appends the result
+    to a Redis stream, and a consumer in each worker records them in Postgres in batches.
+    An entry is acknowledged once its transaction has committed. Entries left pending by
+    a failed batch or a dead worker are claimed again after RESULT_QUEUE_RETRY_MS and
+    retried one by one, up to RESULT_QUEUE_MAX_ATTEMPTS deliveries before going to the
+    dead-letter stream. Recording is idempotent on game_id, so redelivery is harmless.
+    """
+    _consumer = f"{socket.gethostname()}-{os.getpid()}"
+    _worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def enqueue(cls, result: GameResult):
+        await get_redis().xadd(RESULTS_STREAM, _encode(result))
+
+    @classmethod
+    def start(cls):
+        if cls._worker is None:
+            cls._worker = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        # A batch interrupted here is rolled back and stays pending for the next claim
+        if cls._worker is not None:
+            cls._worker.cancel()
+            cls._worker = None
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            try:
+                await cls._create_group()
+                while True:
+                    await cls.process_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Game result consumer failed: {e}. Restarting.")
+                await asyncio.sleep(1)
+
+    @classmethod
+    async def _create_group(cls):
+        try:
+            await get_redis().xgroup_create(RESULTS_STREAM, RESULTS_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @classmethod
+    async def process_once(cls, block_ms: Optional[int] = None) -> int:
+        """Record one batch of results, retried ones first. Returns the number of entries handled."""
+        redis = get_redis()
+        claimed = await redis.xautoclaim(
+            RESULTS_STREAM, RESULTS_GROUP, cls._consumer,
+            min_idle_time=settings.RESULT_QUEUE_RETRY_MS, count=settings.RESULT_QUEUE_BATCH_SIZE
+        )
+        retries = claimed[1]
+        if retries:
+            # One at a time, so a result that keeps failing cannot hold back the others
+            for entry in retries:
+                await cls._retry(entry)
+            return len(retries)
+
+        entries = _read_entries(await redis.xreadgroup(
+            RESULTS_GROUP, cls._consumer, {RESULTS_STREAM: ">"},
+            count=settings.RESULT_QUEUE_BATCH_SIZE,
+            block=settings.RESULT_QUEUE_BLOCK_MS if block_ms is None else block_ms
+        ))
+        if entries:
+            try:
+                await cls._record(entries)
+            except Exception as e:
+                logger.error(f"Recording {len(entries)} game results failed: {e}. They will be retried.")
+        return len(entries)
+
+    @classmethod
+    async def _retry(cls, entry):
+        entry_id, fields = entry
+        pending = await get_redis().xpending_range(RESULTS_STREAM, RESULTS_GROUP, entry_id, entry_id, 1)
+        attempts = pending[0]["times_delivered"] if pending else 1
+        try:
+            await cls._record([entry])
+        except Exception as e:
+            if attempts < settings.RESULT_QUEUE_MAX_ATTEMPTS:
+                logger.warning(f"Recording game result {entry_id} failed (attempt {attempts}): {e}")
+                return
+            logger.error(f"Giving up on game result {entry_id} after {attempts} attempts: {e}")
+            await get_redis().xadd(DEAD_RESULTS_STREAM, {**fields, b"error": str(e)})
+            await cls._acknowledge([entry_id])
+
+    @classmethod
+    async def _record(cls, entries: list):
+        from app.services.game_service import GameService
+        results = [_decode(fields) for _, fields in entries]
+        async with AsyncSessionLocal() as session:
+            histories = await game_history_crud.finalize_games(session, results, GameService().calculate_new_elo)
+        await cls._acknowledge([entry_id for entry_id, _ in entries])
+        logger.info(f"Recorded {len(histories)} of {len(results)} finished games")
+
+    @classmethod
+    async def _acknowledge(cls, entry_ids: list):
+        redis = get_redis()
+        await redis.xack(RESULTS_STREAM, RESULTS_GROUP, *entry_ids)
+        # Acknowledged entries are not needed anymore; keeps the stream small
+        await redis.xdel(RESULTS_STREAM, *entry_ids)
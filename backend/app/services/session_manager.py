@@ -1,32 +1,91 @@
-import redis.asyncio as redis
-from app.core.config import get_settings
-from app.schemas.game_state import GameState
-import json
+import time
+from typing import Optional
+from app.core.redis import get_redis
+from app.schemas.game_state import GameState, MoveRecord
+from app.services.game_cache import GAME_UPDATES_CHANNEL
+from app.services.state_codec import encode_state, decode_state
 
-settings = get_settings()
+# Compare-and-set of a game record in one round trip, appending the move (if any)
+# to the game's move log and announcing the new version to the other workers' caches.
+# KEYS: record, version counter, move log. ARGV: expected version, new version,
+# new record, ttl, update channel, update message, move log entry or ''.
+# Records written before versioning have no counter and count as version 0.
+CAS_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[4])
+if ARGV[7] ~= '' then
+    redis.call('RPUSH', KEYS[3], ARGV[7])
+    redis.call('EXPIRE', KEYS[3], ARGV[4])
+end
+redis.call('PUBLISH', ARGV[5], ARGV[6])
+return 1
+"""
 
 class SessionManager:
     def __init__(self):
-        self.redis = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+        # Shared pooled client; creating a SessionManager opens no connection
+        self.redis = get_redis()
         self.ttl = 3600 * 24 # 24 hours
+        # Runs with EVALSHA, falling back to EVAL the first time Redis sees it
+        self._cas = self.redis.register_script(CAS_SCRIPT)
+
+    @staticmethod
+    def _version_key(game_id: str) -> str:
+        return f"game:{game_id}:ver"
+
+    @staticmethod
+    def _moves_key(game_id: str) -> str:
+        return f"game:{game_id}:moves"
 
     async def save_game(self, game_id: str, state: GameState):
-        """Save game state to Redis with fast write."""
-        await self.redis.setex(
-            f"game:{game_id}",
-            self.ttl,
-            state.model_dump_json()
+        """Unconditionally save game state (and its version) to Redis, starting an empty move log."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._moves_key(game_id))
+            pipe.set(f"game:{game_id}", encode_state(state), ex=self.ttl)
+            pipe.set(self._version_key(game_id), state.version, ex=self.ttl)
+            pipe.publish(GAME_UPDATES_CHANNEL, f"{state.version}:{game_id}")
+            await pipe.execute()
+
+    async def compare_and_set(self, game_id: str, state: GameState, expected_version: int,
+                              move: Optional[tuple[int, str]] = None) -> bool:
+        """
+        Save `state` only if the stored game is still at `expected_version`.
+        The state is stamped with the next version. When `move` (ply, uci) is given it
+        is appended to the move log in the same step. Returns False on conflict.
+        """
+        state.version = expected_version + 1
+        entry = ""
+        if move is not None:
+            ply, uci = move
+            entry = f"{ply}:{uci}:{int(time.time() * 1000)}"
+        saved = await self._cas(
+            keys=[f"game:{game_id}", self._version_key(game_id), self._moves_key(game_id)],
+            args=[expected_version, state.version, encode_state(state), self.ttl,
+                  GAME_UPDATES_CHANNEL, f"{state.version}:{game_id}", entry]
         )
+        return bool(saved)
 
     async def get_game(self, game_id: str) -> GameState | None:
         """Retrieve game state from Redis (Sub-millisecond latency)."""
         data = await self.redis.get(f"game:{game_id}")
         if data:
-            return GameState.model_validate_json(data)
+            return decode_state(data)
         return None
 
-    async def delete_game(self, game_id: str):
-        await self.redis.delete(f"game:{game_id}")
+    async def get_moves(self, game_id: str, start: int = 0) -> list[MoveRecord]:
+        """Moves of a game from index `start` (0 = first move) in the order they were played."""
+        entries = await self.redis.lrange(self._moves_key(game_id), start, -1)
+        moves = []
+        for entry in entries:
+            ply, uci, timestamp = entry.decode().split(":")
+            moves.append(MoveRecord(ply=int(ply), uci=uci, timestamp=int(timestamp)))
+        return moves
+
+    async def count_moves(self, game_id: str) -> int:
+        return await self.redis.llen(self._moves_key(game_id))
 
-    async def close(self):
-        await self.redis.close()
+    async def delete_game(self, game_id: str):
+        await self.redis.delete(f"game:{game_id}", self._version_key(game_id), self._moves_key(game_id))
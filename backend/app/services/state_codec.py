@@ -0,0 +1,116 @@
+import struct
+from typing import Optional
+import chess
+from app.schemas.game_state import GameState
+
+# Binary game record:
+#   header  magic, format, flags, version, white id, black id, last move
+#   fen, termination, difficulty   each as a 1-byte length + ASCII
+#   legal moves                    1-byte count + 16-bit move codes
+# Records starting with '{' are the JSON written before this format.
+MAGIC = 0xC5
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">BBBIqqH")
+
+# Flag bits; the winner uses the two high bits (0 none, 1 White, 2 Black)
+CHECK = 1 << 0
+CHECKMATE = 1 << 1
+STALEMATE = 1 << 2
+GAME_OVER = 1 << 3
+HAS_WHITE = 1 << 4
+HAS_BLACK = 1 << 5
+WINNER_SHIFT = 6
+WINNERS = (None, 'w', 'b')
+
+def _move_tables() -> tuple[dict, dict]:
+    """
+    Every 16-bit move code (from square, to square << 6, promotion piece type << 12)
+    with its UCI string. Table lookups are far cheaper than parsing moves one by one.
+    """
+    to_code, to_uci = {}, {}
+    for promotion in (None, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
+        for from_square in chess.SQUARES:
+            for to_square in chess.SQUARES:
+                code = from_square | to_square << 6 | (promotion or 0) << 12
+                uci = chess.SQUARE_NAMES[from_square] + chess.SQUARE_NAMES[to_square]
+                if promotion:
+                    uci += chess.piece_symbol(promotion)
+                to_code[uci] = code
+                to_uci[code] = uci
+    return to_code, to_uci
+
+MOVE_CODES, MOVE_UCI = _move_tables()
+
+def encode_move(uci: str) -> int:
+    return MOVE_CODES[uci]
+
+def decode_move(code: int) -> str:
+    return MOVE_UCI[code]
+
+def _pack_str(value: Optional[str]) -> bytes:
+    data = (value or "").encode("ascii")
+    return bytes((len(data),)) + data
+
+def _unpack_str(data: bytes, offset: int) -> tuple[Optional[str], int]:
+    length = data[offset]
+    end = offset + 1 + length
+    return (data[offset + 1:end].decode("ascii") or None), end
+
+def encode_state(state: GameState) -> bytes:
+    flags = (
+        (CHECK if state.is_check else 0)
+        | (CHECKMATE if state.is_checkmate else 0)
+        | (STALEMATE if state.is_stalemate else 0)
+        | (GAME_OVER if state.is_game_over else 0)
+        | (HAS_WHITE if state.white_player_id is not None else 0)
+        | (HAS_BLACK if state.black_player_id is not None else 0)
+        | WINNERS.index(state.winner) << WINNER_SHIFT
+    )
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, flags, state.version,
+        state.white_player_id or 0, state.black_player_id or 0,
+        encode_move(state.last_move) if state.last_move else 0
+    )
+    moves = [MOVE_CODES[uci] for uci in state.legal_moves]
+    return b"".join((
+        header,
+        _pack_str(state.fen),
+        _pack_str(state.termination),
+        _pack_str(state.difficulty),
+        bytes((len(moves),)),
+        struct.pack(f">{len(moves)}H", *moves),
+    ))
+
+def decode_state(data: bytes) -> GameState:
+    """Decode a binary record, or a JSON record written by older versions."""
+    if data[:1] == b"{":
+        return GameState.model_validate_json(data)
+    if data[0] != MAGIC:
+        raise ValueError("Unknown game record encoding")
+    if data[1] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported game record format {data[1]}")
+
+    _, _, flags, version, white_id, black_id, last_move = HEADER.unpack_from(data)
+    offset = HEADER.size
+    fen, offset = _unpack_str(data, offset)
+    termination, offset = _unpack_str(data, offset)
+    difficulty, offset = _unpack_str(data, offset)
+    count = data[offset]
+    codes = struct.unpack_from(f">{count}H", data, offset + 1)
+
+    return GameState(
+        fen=fen,
+        turn=fen.split(" ", 2)[1],
+        is_check=bool(flags & CHECK),
+        is_checkmate=bool(flags & CHECKMATE),
+        is_stalemate=bool(flags & STALEMATE),
+        is_game_over=bool(flags & GAME_OVER),
+        winner=WINNERS[flags >> WINNER_SHIFT],
+        termination=termination,
+        legal_moves=[MOVE_UCI[code] for code in codes],
+        last_move=decode_move(last_move) if last_move else None,
+        white_player_id=white_id if flags & HAS_WHITE else None,
+        black_player_id=black_id if flags & HAS_BLACK else None,
+        difficulty=difficulty,
+        version=version
+    )
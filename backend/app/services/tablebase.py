@@ -0,0 +1,93 @@
+import logging
+import os
+from typing import Optional
+import chess
+import chess.syzygy
+
+logger = logging.getLogger(__name__)
+
+# Syzygy tables exist for at most 7 pieces (kings included)
+MAX_TABLEBASE_PIECES = 7
+
+class EndgameTablebase:
+    """
+    Locally mounted Syzygy tables.
+    python-chess keeps at most `max_open_files` table files open and closes the
+    least recently used one when it needs another.
+    """
+
+    def __init__(self, path: str, max_open_files: int = 64):
+        self.path = path
+        self.max_open_files = max_open_files
+        self._tablebase: Optional[chess.syzygy.Tablebase] = None
+        self._unavailable = False
+
+    def _open(self) -> Optional[chess.syzygy.Tablebase]:
+        if self._tablebase is None and not self._unavailable:
+            if not os.path.isdir(self.path):
+                logger.warning(f"Syzygy tables not found at {self.path}. Endgames will be searched.")
+                self._unavailable = True
+                return None
+            self._tablebase = chess.syzygy.open_tablebase(self.path, max_fds=self.max_open_files)
+        return self._tablebase
+
+    def probe_wdl(self, board: chess.Board) -> Optional[int]:
+        """
+        Win/draw/loss for the side to move: 2 win, 1 cursed win, 0 draw,
+        -1 blessed loss, -2 loss. None when the position is not covered.
+        """
+        if chess.popcount(board.occupied) > MAX_TABLEBASE_PIECES or board.castling_rights:
+            return None
+        tablebase = self._open()
+        if tablebase is None:
+            return None
+        return tablebase.get_wdl(board)
+
+    def best_move(self, board: chess.Board) -> Optional[chess.Move]:
+        """
+        The move that keeps the best tablebase result: the fastest zeroing
+        conversion when winning, the longest resistance when losing.
+        """
+        if self.probe_wdl(board) is None:
+            return None
+        tablebase = self._tablebase
+
+        best_key, best_move = None, None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                wdl = tablebase.get_wdl(board)
+                dtz = tablebase.get_dtz(board)
+            finally:
+                board.pop()
+            if wdl is None or dtz is None:
+                return None
+
+            # Results of the child are from the opponent's point of view
+            ours = -wdl
+            if ours > 0:
+                key = (ours, zeroing, dtz)
+            elif ours < 0:
+                key = (ours, not zeroing, dtz)
+            else:
+                key = (ours, False, 0)
+            if best_key is None or key > best_key:
+                best_key, best_move = key, move
+        return best_move
+
+    def close(self):
+        if self._tablebase is not None:
+            self._tablebase.close()
+            self._tablebase = None
+
+# One set of tables per directory in each process
+_tablebases: dict[str, EndgameTablebase] = {}
+
+def get_tablebase(path: Optional[str], max_open_files: int = 64) -> Optional[EndgameTablebase]:
+    if not path:
+        return None
+    tablebase = _tablebases.get(path)
+    if tablebase is None:
+        tablebase = _tablebases[path] = EndgameTablebase(path, max_open_files=max_open_files)
+    return tablebase
@@ -120,6 +120,7 @@ class TelegramService:
         from app.models.user import User
         from sqlalchemy import select
         from app.core.database import AsyncSessionLocal
+        from app.services.user_cache import UserCache
         
         async with AsyncSessionLocal() as db:
             result = await db.execute(select(User).where(User.telegram_id == user_id))
@@ -127,6 +128,7 @@ class TelegramService:
             if db_user:
                 db_user.preferred_language = lang_code
                 await db.commit()
+                await UserCache.invalidate(user_id)
                 await query.edit_message_text(text=f"Language updated to {lang_code.upper()}! ✅")
             else:
                 await query.edit_message_text(text="User not found. Please type /start first.")
@@ -139,7 +141,7 @@ class TelegramService:
             return
 
         import asyncio
-        import redis.asyncio as redis
+        from app.core.redis import get_redis
         from telegram.error import Conflict
         from telegram.ext import CallbackQueryHandler
 
@@ -161,7 +163,7 @@ class TelegramService:
         # 2. Leader Election for Receiver Role (Polling/Webhook)
         # Only one instance should handle updates to avoid Conflict errors.
         try:
-            redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+            redis_client = get_redis()
             lock_key = "telegram_bot_leader"
             leader_id = f"instance_{settings.PROJECT_NAME}_{asyncio.get_event_loop().time()}" # Simple unique ID
             
@@ -181,7 +183,7 @@ class TelegramService:
                         except asyncio.CancelledError:
                             # Release lock on shutdown
                             current_leader = await redis_client.get(lock_key)
-                            if current_leader == leader_id:
+                            if current_leader == leader_id.encode():
                                 await redis_client.delete(lock_key)
                             break
                         except Exception as e:
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Optional
+import chess
+
+# Entry bound types
+EXACT = 0
+LOWER = 1  # score is a lower bound (fail-high)
+UPPER = 2  # score is an upper bound (fail-low)
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed on the Polyglot Zobrist hash.
+    Slots are indexed by the low bits of the key; a slot is overwritten when the
+    new entry was searched at least as deep as the one it replaces.
+    Entries are plain tuples: (key, depth, score, flag, move).
+    """
+
+    def __init__(self, size: int = 1 << 16):
+        # Round down to a power of two so the index is a simple mask
+        size = 1 << max(size, 1).bit_length() - 1
+        self.size = size
+        self._mask = size - 1
+        self._entries: list = [None] * size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def probe(self, key: int) -> Optional[tuple]:
+        entry = self._entries[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[chess.Move]):
+        index = key & self._mask
+        current = self._entries[index]
+        if current is None or current[0] == key or depth >= current[1]:
+            # Keep the known best move when re-storing a position without one
+            if move is None and current is not None and current[0] == key:
+                move = current[4]
+            self._entries[index] = (key, depth, score, flag, move)
+            self.stores += 1
+
+    def best_move(self, key: int) -> Optional[chess.Move]:
+        entry = self._entries[key & self._mask]
+        return entry[4] if entry is not None and entry[0] == key else None
+
+    def clear(self):
+        self._entries = [None] * self.size
+        self.hits = self.misses = self.stores = 0
+
+    def stats(self) -> dict:
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / probes, 3) if probes else 0.0,
+        }
+
+# Per-game tables of this worker process, least recently used first
+_game_tables: "OrderedDict[str, TranspositionTable]" = OrderedDict()
+
+def get_game_table(game_id: str, size: int = 1 << 16, max_games: int = 16) -> TranspositionTable:
+    """Return the table for a game, creating it (and evicting the oldest game) if needed."""
+    table = _game_tables.get(game_id)
+    if table is not None:
+        _game_tables.move_to_end(game_id)
+        return table
+
+    table = TranspositionTable(size)
+    _game_tables[game_id] = table
+    while len(_game_tables) > max_games:
+        _game_tables.popitem(last=False)
+    return table
+
+def discard_game_table(game_id: str):
+    """Free the table of a finished game."""
+    _game_tables.pop(game_id, None)
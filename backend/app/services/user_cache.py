@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+COLUMNS = User.__table__.columns
+
+# Write a user unless it was invalidated since the caller read its generation.
+# KEYS: user, generation. ARGV: generation read before loading the user, values, ttl.
+# A user never invalidated (or whose generation expired) is at generation 0.
+PUT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+class UserCache:
+    """
+    Recently authenticated users by Telegram id, so get_current_user needs no SELECT.
+    Redis holds each user for USER_CACHE_TTL seconds and is shared by all workers;
+    each worker keeps its own copies for USER_CACHE_LOCAL_TTL seconds on top of it.
+    Every write to a user must call invalidate() after committing. A worker may still
+    serve its local copy of a user changed on another worker for up to the local TTL.
+    Code that changes a user based on its current values must reload it (populate_existing),
+    since the session may hold the cached copy.
+    """
+    _users: "OrderedDict[int, tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f"user:{telegram_id}"
+
+    @staticmethod
+    def _generation_key(telegram_id: int) -> str:
+        return f"user:{telegram_id}:gen"
+
+    @classmethod
+    async def get(cls, db: AsyncSession, telegram_id: int) -> Optional[User]:
+        """The cached user attached to `db` (changes to it are saved as usual), or None."""
+        values = cls._get_local(telegram_id)
+        if values is None:
+            try:
+                data = await get_redis().get(cls._key(telegram_id))
+            except RedisError as e:
+                logger.warning(f"User cache read failed: {e}")
+                return None
+            if data is None:
+                return None
+            values = cls._decode(data)
+            cls._put_local(telegram_id, values)
+
+        user = User(**values)
+        # Persistent without a SELECT: the cached values count as loaded from the database
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    @classmethod
+    async def generation(cls, telegram_id: int) -> Optional[int]:
+        """Read before loading a user from the database, then passed to put(). None if Redis is down."""
+        try:
+            return int(await get_redis().get(cls._generation_key(telegram_id)) or 0)
+        except RedisError as e:
+            logger.warning(f"User cache read failed: {e}")
+            return None
+
+    @classmethod
+    async def put(cls, user: User, generation: Optional[int]):
+        """
+        Cache a user loaded from the database after reading `generation`.
+        Skipped if the user was invalidated in between: the loaded values may predate that write.
+        """
+        if generation is None:
+            return
+        values = {column.key: getattr(user, column.key) for column in COLUMNS}
+        redis = get_redis()
+        try:
+            stored = await redis.register_script(PUT_SCRIPT)(
+                keys=[cls._key(user.telegram_id), cls._generation_key(user.telegram_id)],
+                args=[generation, cls._encode(values), settings.USER_CACHE_TTL]
+            )
+        except RedisError as e:
+            logger.warning(f"User cache write failed: {e}")
+            return
+        if stored:
+            cls._put_local(user.telegram_id, values)
+
+    @classmethod
+    async def invalidate(cls, telegram_id: int):
+        cls._users.pop(telegram_id, None)
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.delete(cls._key(telegram_id))
+                # Fails the put() of any read that started before this write
+                pipe.incr(cls._generation_key(telegram_id))
+                pipe.expire(cls._generation_key(telegram_id), settings.USER_CACHE_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed: {e}")
+
+    @classmethod
+    def clear(cls):
+        cls._users.clear()
+
+    @classmethod
+    def _get_local(cls, telegram_id: int) -> Optional[dict]:
+        entry = cls._users.get(telegram_id)
+        if entry is None:
+            return None
+        values, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del cls._users[telegram_id]
+            return None
+        cls._users.move_to_end(telegram_id)
+        return values
+
+    @classmethod
+    def _put_local(cls, telegram_id: int, values: dict):
+        cls._users[telegram_id] = (values, time.monotonic() + settings.USER_CACHE_LOCAL_TTL)
+        cls._users.move_to_end(telegram_id)
+        while len(cls._users) > settings.USER_CACHE_SIZE:
+            cls._users.popitem(last=False)
+
+    @staticmethod
+    def _encode(values: dict) -> bytes:
+        return json.dumps({k: v.isoformat() if isinstance(v, datetime) else v for k, v in values.items()}).encode()
+
+    @staticmethod
+    def _decode(data: bytes) -> dict:
+        values = json.loads(data)
+        for column in COLUMNS:
+            if isinstance(column.type, DateTime) and values.get(column.key) is not None:
+                values[column.key] = datetime.fromisoformat(values[column.key])
+        return values
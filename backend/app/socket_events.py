@@ -1,13 +1,18 @@
-import asyncio
 from app.core.socket import sio
 from app.services.game_service import GameService
 from app.schemas.game_state import GameState
 
 from app.core.socket import sio
-from app.services.game_service import GameService
-from app.schemas.game_state import GameState
+from app.services.game_service import GameService, MoveError
+from app.services.game_actor import GameActors
+from app.schemas.game_state import GameState, MoveRecord
 from app.core.security import validate_init_data
-from fastapi import HTTPException
+from app.services.bot_pool import BotSearchPool
+from app.core.config import get_settings
+from typing import Optional
+import msgpack
+
+settings = get_settings()
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -27,14 +32,49 @@ async def connect(sid, environ, auth):
         user_data = validate_init_data(init_data)
         user_id = user_data.get('id')
         
+        # Clients asking for it get game events as msgpack-encoded binary
+        binary = settings.SOCKETIO_MSGPACK and auth.get('encoding') == 'msgpack'
+
         # Save user_id to session
-        await sio.save_session(sid, {'user_id': user_id, 'user_data': user_data})
+        await sio.save_session(sid, {'user_id': user_id, 'user_data': user_data, 'msgpack': binary})
         print(f"Socket {sid} connected as User {user_id}")
         
     except Exception as e:
         print(f"Socket connection rejected: {e}")
         return False # Reject connection
 
+def full_room(game_id: str, binary: bool = False) -> str:
+    """Clients of a game that receive the full game_state after every move."""
+    return f"{game_id}:full:mp" if binary else f"{game_id}:full"
+
+def delta_room(game_id: str, binary: bool = False) -> str:
+    """Clients that acknowledged the current version and receive move_applied deltas."""
+    return f"{game_id}:delta:mp" if binary else f"{game_id}:delta"
+
+def encode_payload(payload: dict, binary: bool):
+    """msgpack bytes (sent as a binary attachment) for clients that negotiated it, else the dict as JSON."""
+    return msgpack.packb(payload) if binary else payload
+
+async def uses_msgpack(sid) -> bool:
+    session = await sio.get_session(sid)
+    return session.get('msgpack', False)
+
+@sio.event
+async def disconnect(sid):
+    """
+    Stop pondering for games nobody is watching anymore.
+    The bot's real search keeps running: its move is saved for the player to find on
+    rejoining, and nothing would queue the bot's turn again if it were cancelled.
+    """
+    for room in sio.rooms(sid):
+        # Every client is in the plain game room; the :full/:delta rooms only pick the payload
+        if room == sid or ':' in room:
+            continue
+        others = [p for p, _ in sio.manager.get_participants('/', room) if p != sid]
+        if not others and BotSearchPool.stop_ponder(room):
+            print(f"Stopped pondering for game {room} (player disconnected)")
+    print(f"Client disconnected: {sid}")
+
 @sio.event
 async def join_room(sid, data):
     """
@@ -44,21 +84,20 @@ async def join_room(sid, data):
     
     session = await sio.get_session(sid)
     user_id = session.get('user_id')
+    binary = session.get('msgpack', False)
     
     if room:
         await sio.enter_room(sid, room)
+        # Full states until the client acknowledges a version.
+        # Rooms are switched enter-first so no broadcast falls between them.
+        await sio.enter_room(sid, full_room(room, binary))
+        await sio.leave_room(sid, delta_room(room, binary))
         print(f"Socket {sid} (User {user_id}) joined room {room}")
         
-        service = GameService()
-        
-        # Try to join/assign player if user_id present
-        if user_id:
-            await service.join_game(room, user_id)
-
-        # Send current state
-        state = await service.get_game_state(room)
+        # Try to join/assign player if user_id present, then send current state
+        state = await GameActors.get(room).join(user_id)
         if state:
-            await sio.emit('game_state', state.model_dump(), room=sid)
+            await sio.emit('game_state', encode_payload(state.model_dump(), binary), room=sid)
 
 @sio.event
 async def make_move(sid, data):
@@ -72,44 +111,121 @@ async def make_move(sid, data):
     user_id = session.get('user_id') # Trusted User ID
     
     if game_id and uci:
-        service = GameService()
-        
-        # 1. Fetch state FIRST to validate turn
-        current_state = await service.get_game_state(game_id)
-        if not current_state:
-             await sio.emit('error', {'message': 'Game not found'}, room=sid)
-             return
-
-        # 2. Validate Turn Authorization
-        is_white = (current_state.white_player_id == user_id)
-        is_black = (current_state.black_player_id == user_id)
-        
-        if not (is_white or is_black):
-             await sio.emit('error', {'message': 'You are not a player in this game'}, room=sid)
-             return
-             
-        turn_color = current_state.turn # 'w' or 'b'
-        if (turn_color == 'w' and not is_white) or (turn_color == 'b' and not is_black):
-             await sio.emit('error', {'message': 'Not your turn'}, room=sid)
-             return
-
-        # 3. Apply move
-        new_state = await service.make_move(game_id, uci)
-        if new_state:
-            # Broadcast to room
-            await sio.emit('game_state', new_state.model_dump(), room=game_id)
-            
-            # Check if it's a bot's turn
-            if not new_state.is_game_over and new_state.black_player_id == -1 and new_state.turn == 'b':
-                # Move bot logic to a separate task to avoid blocking this event
-                asyncio.create_task(handle_bot_turn(game_id))
-        else:
-            await sio.emit('error', {'message': 'Illegal move'}, room=sid)
-
-async def handle_bot_turn(game_id: str):
-    """Wait briefly, then make bot move and broadcast."""
-    await asyncio.sleep(0.8) # Realism delay
+        if not user_id:
+            await sio.emit('error', {'message': 'You are not a player in this game'}, room=sid)
+            return
+        try:
+            # Applied in order with the game's other commands; the actor broadcasts
+            # the new state and queues the bot's reply
+            await GameActors.get(game_id).move(uci, user_id)
+        except MoveError as e:
+            await sio.emit('error', {'message': str(e)}, room=sid)
+
+@sio.event
+async def ack_state(sid, data):
+    """
+    Data expects: {'game_id': '...', 'version': 12}
+    A client holding the current version switches to move_applied deltas;
+    one that is behind gets the full state (and acknowledges again).
+    """
+    game_id = data.get('game_id')
+    if not game_id or game_id not in sio.rooms(sid):
+        return
+    state = await GameService().get_game_state(game_id)
+    if not state:
+        return
+    binary = await uses_msgpack(sid)
+    if data.get('version') == state.version:
+        # A move broadcast between the two calls reaches the client twice, never zero times
+        await sio.enter_room(sid, delta_room(game_id, binary))
+        await sio.leave_room(sid, full_room(game_id, binary))
+    else:
+        await sio.emit('game_state', encode_payload(state.model_dump(), binary), room=sid)
+
+@sio.event
+async def sync(sid, data):
+    """
+    Data expects: {'game_id': '...'}
+    Sent by a client that missed a delta (base_version is not its version).
+    """
+    game_id = data.get('game_id')
+    if not game_id or game_id not in sio.rooms(sid):
+        return
+    state = await GameService().get_game_state(game_id)
+    if state:
+        await sio.emit('game_state', encode_payload(state.model_dump(), await uses_msgpack(sid)), room=sid)
+
+@sio.event
+async def resume(sid, data):
+    """
+    Data expects: {'game_id': '...', 'version': 12, 'ply': 9}
+    Sent after a reconnect instead of join_room by a client that already holds a state.
+    It gets the moves it missed (moves_resumed) or, when too far behind, the full state.
+    """
+    game_id = data.get('game_id')
+    if not game_id:
+        return
+    # Rooms first: a move saved after the read below is then broadcast to this client too
+    binary = await uses_msgpack(sid)
+    await sio.enter_room(sid, game_id)
+    await sio.enter_room(sid, delta_room(game_id, binary))
+    await sio.leave_room(sid, full_room(game_id, binary))
+
+    reply = await resume_reply(game_id, data.get('version'), data.get('ply'))
+    if reply:
+        event, payload = reply
+        await sio.emit(event, encode_payload(payload, binary), room=sid)
+
+async def resume_reply(game_id: str, version, ply) -> Optional[tuple[str, dict]]:
+    """The event and payload bringing a client at (version, ply) up to date; None if no game."""
     service = GameService()
-    bot_state = await service.make_bot_move(game_id)
-    if bot_state:
-        await sio.emit('game_state', bot_state.model_dump(), room=game_id)
+    state = await service.get_game_state(game_id)
+    if not state:
+        return None
+    if isinstance(version, int) and isinstance(ply, int) and version <= state.version \
+            and 0 <= state.ply - ply <= settings.RESUME_MAX_MOVES:
+        moves = await service.get_moves(game_id, ply) if ply < state.ply else []
+        # Only an exact run of the missing moves will do (the log restarts with the game)
+        if [m.ply for m in moves] == list(range(ply + 1, state.ply + 1)):
+            return 'moves_resumed', moves_resumed_payload(game_id, state, version, moves)
+    return 'game_state', state.model_dump()
+
+def moves_resumed_payload(game_id: str, state: GameState, base_version: int, moves: list[MoveRecord]) -> dict:
+    """The moves a client holding base_version missed, and the state they lead to."""
+    payload = move_applied_payload(game_id, state)
+    del payload['uci']
+    payload.update(
+        base_version=base_version,
+        moves=[m.uci for m in moves],
+        # Seats may have been taken meanwhile
+        white_player_id=state.white_player_id,
+        black_player_id=state.black_player_id,
+    )
+    return payload
+
+def move_applied_payload(game_id: str, state: GameState) -> dict:
+    """What a client holding version - 1 needs to reach `state`; legal moves are recomputed client side."""
+    return {
+        'game_id': game_id,
+        'uci': state.last_move,
+        'fen': state.fen,
+        'ply': state.ply,
+        'version': state.version,
+        'base_version': state.version - 1,
+        'is_check': state.is_check,
+        'is_checkmate': state.is_checkmate,
+        'is_stalemate': state.is_stalemate,
+        'is_game_over': state.is_game_over,
+        'winner': state.winner,
+        'termination': state.termination,
+    }
+
+async def broadcast_state(game_id: str, state: GameState):
+    delta, full = move_applied_payload(game_id, state), state.model_dump()
+    await sio.emit('move_applied', delta, room=delta_room(game_id))
+    await sio.emit('game_state', full, room=full_room(game_id))
+    if settings.SOCKETIO_MSGPACK:
+        await sio.emit('move_applied', msgpack.packb(delta), room=delta_room(game_id, binary=True))
+        await sio.emit('game_state', msgpack.packb(full), room=full_room(game_id, binary=True))
+
+GameActors.on_change(broadcast_state)
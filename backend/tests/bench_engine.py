@@ -0,0 +1,210 @@
+"""
+Engine benchmark: perft correctness/speed, search nodes-per-second and the
+per-move cost of building a GameState.
+
+Usage (from backend/):
+    python tests/bench_engine.py                       # print JSON report
+    python tests/bench_engine.py --output bench.json   # save report
+    python tests/bench_engine.py --baseline bench.json --max-regression 0.15
+
+With --baseline the script exits with status 1 when search nodes/sec or
+p95 latency regress by more than --max-regression, or a perft count is wrong.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import chess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.game_engine import GameEngine
+from app.services.evaluation import IncrementalEvaluator
+from app.schemas.game_state import GameState
+
+# Standard perft positions with their known node counts per depth
+PERFT_POSITIONS = {
+    "startpos": (chess.STARTING_FEN, [20, 400, 8902, 197281]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+}
+
+# Fixed set of middlegame/endgame positions for search speed
+SEARCH_POSITIONS = [
+    chess.STARTING_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP1B1PPP/R2QKB1R w KQ - 0 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+]
+
+def perft(engine: GameEngine, depth: int) -> int:
+    """Count leaf nodes, pushing moves through the engine (board + incremental evaluator)."""
+    if depth == 0:
+        return 1
+    moves = list(engine.board.legal_moves)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        engine._push(move)
+        nodes += perft(engine, depth - 1)
+        engine._pop()
+    return nodes
+
+def run_perft(max_depth: int) -> list:
+    results = []
+    for name, (fen, expected) in PERFT_POSITIONS.items():
+        depth = min(max_depth, len(expected))
+        engine = GameEngine()
+        engine.board = chess.Board(fen)
+        engine.evaluator = IncrementalEvaluator(engine.board)
+        start = time.perf_counter()
+        nodes = perft(engine, depth)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "position": name,
+            "depth": depth,
+            "nodes": nodes,
+            "expected": expected[depth - 1],
+            "ok": nodes == expected[depth - 1],
+            "seconds": round(elapsed, 4),
+            "nps": round(nodes / elapsed) if elapsed else 0,
+        })
+    return results
+
+def legacy_get_state(board: chess.Board) -> GameState:
+    """GameEngine.get_state before the single-pass builder, kept as the benchmark reference."""
+    return GameState(
+        fen=board.fen(),
+        turn='w' if board.turn == chess.WHITE else 'b',
+        is_check=board.is_check(),
+        is_checkmate=board.is_checkmate(),
+        is_stalemate=board.is_stalemate(),
+        is_game_over=board.is_game_over(),
+        winner='w' if board.outcome() and board.outcome().winner == chess.WHITE else
+               ('b' if board.outcome() and board.outcome().winner == chess.BLACK else None),
+        legal_moves=[move.uci() for move in board.legal_moves]
+    )
+
+def run_state(iterations: int) -> dict:
+    """Microseconds per GameState build, legacy vs single pass, over the search positions."""
+    boards = [chess.Board(fen) for fen in SEARCH_POSITIONS]
+    engines = []
+    for board in boards:
+        engine = GameEngine()
+        engine.board = board
+        engines.append(engine)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for board in boards:
+            legacy_get_state(board)
+    legacy = (time.perf_counter() - start) / (iterations * len(boards))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for engine in engines:
+            engine.get_state()
+    single_pass = (time.perf_counter() - start) / (iterations * len(boards))
+
+    return {
+        "iterations": iterations,
+        "legacy_us": round(legacy * 1e6, 2),
+        "single_pass_us": round(single_pass * 1e6, 2),
+        "speedup": round(legacy / single_pass, 2) if single_pass else 0,
+    }
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_search(depth: int, time_ms: int, repeat: int) -> dict:
+    latencies, total_nodes, total_seconds = [], 0, 0.0
+    positions = []
+    for fen in SEARCH_POSITIONS:
+        for _ in range(repeat):
+            # Fresh engine each time so transposition tables do not skew timings
+            engine = GameEngine()
+            engine.board = chess.Board(fen)
+            result = engine.search(time_limit_ms=time_ms, max_depth=depth)
+            latencies.append(result.elapsed_ms)
+            total_nodes += result.nodes
+            total_seconds += result.elapsed_ms / 1000
+        positions.append({"fen": fen, "best_move": result.best_move, "depth": result.depth, "nodes": result.nodes})
+
+    return {
+        "depth": depth,
+        "time_ms": time_ms,
+        "repeat": repeat,
+        "nodes": total_nodes,
+        "nps": round(total_nodes / total_seconds) if total_seconds else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+            "mean": round(statistics.mean(latencies), 2),
+        },
+        "positions": positions,
+    }
+
+def perft_failures(report: dict) -> list:
+    return [f"perft {p['position']} depth {p['depth']}: {p['nodes']} != {p['expected']}"
+            for p in report["perft"] if not p["ok"]]
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Return a list of human readable regressions."""
+    failures = perft_failures(report)
+    old, new = baseline.get("search", {}), report["search"]
+    if old.get("nps") and new["nps"] < old["nps"] * (1 - max_regression):
+        failures.append(f"search nps {new['nps']} < baseline {old['nps']}")
+    old_p95 = old.get("latency_ms", {}).get("p95")
+    if old_p95 and new["latency_ms"]["p95"] > old_p95 * (1 + max_regression):
+        failures.append(f"search p95 {new['latency_ms']['p95']}ms > baseline {old_p95}ms")
+    return failures
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chess engine")
+    parser.add_argument("--perft-depth", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=3, help="fixed search depth per position")
+    parser.add_argument("--time-ms", type=int, default=60000, help="time budget per search")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--state-iterations", type=int, default=200)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "perft": run_perft(args.perft_depth),
+        "search": run_search(args.depth, args.time_ms, args.repeat),
+        "state": run_state(args.state_iterations),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    failures = perft_failures(report)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -44,3 +44,15 @@ async def client(db_session):
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
     app.dependency_overrides.clear()
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the shared Redis client at an in-memory fakeredis (with Lua) for one test."""
+    import fakeredis
+    from app.core import redis as redis_module
+    from app.services.game_cache import HotGames
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_module, "_client", client)
+    HotGames.clear()
+    yield client
+    HotGames.clear()
@@ -23,3 +23,42 @@ async def test_get_user_stats_syncs_profile(client, db_session):
     data = response.json()
     assert data["first_name"] == "NewName"
     assert data["photo_url"] == "new_url"
+
+@pytest.mark.asyncio
+async def test_finalize_game_records_result_once(db_session):
+    from app.crud import game_history as game_history_crud
+    from app.crud.game_history import GameResult
+    from app.services.game_service import GameService
+    white = await user_crud.create_user(db_session, 1111, "White")
+    black = await user_crud.create_user(db_session, 2222, "Black")
+
+    results = [GameResult("final", 1111, 2222, 'w', 'checkmate', total_moves=31)]
+    rate = GameService().calculate_new_elo
+    [history] = await game_history_crud.finalize_games(db_session, results, rate)
+    assert history.white_elo_before == 1000 and history.white_elo_after == 1016
+    # A second finalization (e.g. another worker) changes nothing
+    assert await game_history_crud.finalize_games(db_session, results, rate) == []
+
+    await db_session.refresh(white)
+    await db_session.refresh(black)
+    assert (white.elo, white.games_played, white.wins) == (1016, 1, 1)
+    assert (black.elo, black.games_played, black.losses) == (984, 1, 1)
+
+@pytest.mark.asyncio
+async def test_finalize_games_rates_a_batch_in_order(db_session):
+    from app.crud import game_history as game_history_crud
+    from app.crud.game_history import GameResult
+    from app.services.game_service import GameService
+    a = await user_crud.create_user(db_session, 3331, "A")
+    b = await user_crud.create_user(db_session, 3332, "B")
+
+    results = [GameResult("batch-1", 3331, 3332, 'w', 'checkmate'),
+               GameResult("batch-2", 3332, 3331, None, 'stalemate'),
+               GameResult("batch-1", 3331, 3332, 'w', 'checkmate')]
+    histories = await game_history_crud.finalize_games(db_session, results, GameService().calculate_new_elo)
+    assert [h.game_id for h in histories] == ["batch-1", "batch-2"]
+    # The second game starts from the first one's ratings
+    assert histories[1].black_elo_before == histories[0].white_elo_after
+
+    await db_session.refresh(a)
+    assert (a.games_played, a.wins, a.draws) == (2, 1, 1)
@@ -1,6 +1,29 @@
+import asyncio
+import json
+import msgpack
 import pytest
-from app.services.game_service import GameService
-from app.services.game_engine import GameEngine
+import struct
+import chess
+import chess.polyglot
+from app.services.game_service import GameService, MoveError
+from app.services.game_engine import GameEngine, SearchLimits, DIFFICULTY_LEVELS, DEFAULT_DIFFICULTY
+from app.services import bot_pool
+from app.services.bot_pool import BotSearchPool, BotPoolUnavailable
+from app.services import game_actor
+from app.services import game_service
+from app.services.game_actor import GameActors
+from app.services.game_cache import HotGames
+from app.services import result_queue
+from app.services.result_queue import GameResults
+from app.services.state_codec import encode_state, decode_state
+from app.services.transposition_table import TranspositionTable, EXACT
+from app.services.evaluation import IncrementalEvaluator, evaluate
+from app.services.opening_book import OpeningBook
+from app.services.tablebase import EndgameTablebase
+from app.core.config import get_settings
+from app import socket_events
+from app.socket_events import move_applied_payload, resume_reply, encode_payload, full_room, delta_room
+from bench_engine import PERFT_POSITIONS, perft, legacy_get_state
 
 def test_elo_calculation():
     service = GameService()
@@ -33,3 +56,506 @@ async def test_game_engine_moves():
     
     # Invalid move
     assert not engine.make_move("e2e5") # e2e5 is not legal for white on first move
+
+def test_engine_finds_mate_in_one():
+    engine = GameEngine()
+    engine.board = chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    result = engine.search(time_limit_ms=2000, max_depth=3)
+    assert result.best_move == "a1a8"
+    assert result.nodes > 0
+
+def test_engine_respects_time_budget():
+    engine = GameEngine()
+    result = engine.search(time_limit_ms=100)
+    assert result.best_move in [m.uci() for m in engine.board.legal_moves]
+    assert result.depth >= 1
+    # Allow for the interval between two clock reads
+    assert result.elapsed_ms < 1000
+
+def test_transposition_table_replacement_by_depth():
+    tt = TranspositionTable(size=4)
+    tt.store(5, depth=4, score=10, flag=EXACT, move=None)
+    # Shallower entry colliding in the same slot does not replace the deeper one
+    tt.store(9, depth=2, score=20, flag=EXACT, move=None)
+    assert tt.probe(5)[2] == 10
+    assert tt.probe(9) is None
+    assert tt.hits == 1 and tt.misses == 1
+
+def test_transposition_table_reused_across_searches():
+    tt = TranspositionTable()
+    engine = GameEngine(tt=tt)
+    first = engine.search(time_limit_ms=5000, max_depth=3)
+    hits_before = tt.hits
+    second = GameEngine(tt=tt).search(time_limit_ms=5000, max_depth=3)
+    assert second.best_move == first.best_move
+    assert second.nodes < first.nodes
+    assert tt.hits > hits_before
+
+def test_incremental_evaluation_matches_full_recount():
+    # Castling, en passant and promotions are all reachable from this position
+    board = chess.Board("r3k2r/1P3ppp/8/3pP3/8/8/5PPP/R3K2R w KQkq d6 0 1")
+    evaluator = IncrementalEvaluator(board)
+    for move in list(board.legal_moves):
+        evaluator.push(board, move)
+        board.push(move)
+        assert evaluator.evaluate(board.turn) == evaluate(board)
+        for reply in list(board.legal_moves):
+            evaluator.push(board, reply)
+            board.push(reply)
+            assert evaluator.evaluate(board.turn) == evaluate(board)
+            board.pop()
+            evaluator.pop()
+        board.pop()
+        evaluator.pop()
+    assert evaluator.evaluate(board.turn) == evaluate(board)
+
+def test_difficulty_levels_bound_search_cost():
+    easy = DIFFICULTY_LEVELS["easy"]
+    result = GameEngine().search(easy.time_limit_ms, easy.max_depth, easy.max_nodes)
+    assert result.best_move is not None
+    assert result.nodes <= easy.max_nodes
+
+    service = GameService()
+    limits = service.get_search_limits("hard")
+    assert limits.time_limit_ms <= DIFFICULTY_LEVELS["hard"].time_limit_ms
+    # Unknown or missing levels fall back to the default
+    assert service.get_search_limits(None) == service.get_search_limits(DEFAULT_DIFFICULTY)
+
+def test_opening_book_move_skips_search(tmp_path):
+    board = chess.Board()
+    # Polyglot entry: key, move (to | from << 6), weight, learn
+    e2e4 = chess.E4 | chess.E2 << 6
+    path = tmp_path / "book.bin"
+    path.write_bytes(struct.pack(">QHHI", chess.polyglot.zobrist_hash(board), e2e4, 1, 0))
+
+    engine = GameEngine(book=OpeningBook(str(path)))
+    result = engine.search(time_limit_ms=1000)
+    assert result.from_book and result.best_move == "e2e4"
+    assert result.nodes == 0
+
+    # Out of book positions fall through to the search
+    engine.board.push_uci("d2d4")
+    result = engine.search(time_limit_ms=50)
+    assert not result.from_book and result.nodes > 0
+
+def test_missing_opening_book_is_ignored(tmp_path):
+    book = OpeningBook(str(tmp_path / "missing.bin"))
+    assert book.choose_move(chess.Board()) is None
+
+def test_missing_tablebase_falls_back_to_search(tmp_path):
+    tablebase = EndgameTablebase(str(tmp_path / "syzygy"))
+    engine = GameEngine(tablebase=tablebase)
+    engine.board = chess.Board("8/8/8/4k3/8/8/3QK3/8 w - - 0 1")
+    assert tablebase.probe_wdl(engine.board) is None
+    result = engine.search(time_limit_ms=50)
+    assert not result.from_tablebase and result.best_move is not None
+
+def test_perft_through_engine_push_pop():
+    for name, (fen, expected) in PERFT_POSITIONS.items():
+        engine = GameEngine()
+        engine.board = chess.Board(fen)
+        engine.evaluator = IncrementalEvaluator(engine.board)
+        assert perft(engine, 2) == expected[1], name
+
+def test_search_reports_expected_reply():
+    engine = GameEngine()
+    result = engine.search(time_limit_ms=5000, max_depth=3)
+    board = chess.Board()
+    board.push_uci(result.best_move)
+    assert result.ponder_move is not None
+    assert chess.Move.from_uci(result.ponder_move) in board.legal_moves
+
+@pytest.mark.asyncio
+async def test_ponder_result_served_only_for_pondered_position():
+    limits = SearchLimits(max_depth=2, max_nodes=None, time_limit_ms=1000)
+    board = chess.Board()
+    board.push_uci("e2e4")
+
+    BotSearchPool.start_ponder("ponder-game", board.fen(), limits)
+    result = await BotSearchPool.take_ponder("ponder-game", board.fen())
+    assert result is not None and result.best_move in [m.uci() for m in board.legal_moves]
+
+    # A different reply than the predicted one discards the ponder search
+    BotSearchPool.start_ponder("ponder-game", board.fen(), limits)
+    assert await BotSearchPool.take_ponder("ponder-game", chess.STARTING_FEN) is None
+    assert await BotSearchPool.take_ponder("ponder-game", board.fen()) is None
+
+def test_single_pass_state_matches_legacy_flags():
+    fens = [
+        chess.STARTING_FEN,
+        "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3",  # checkmate
+        "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",  # stalemate
+        "8/8/4k3/8/8/3NK3/8/8 w - - 0 1",  # insufficient material
+        "8/8/4k3/8/8/3RK3/8/8 b - - 150 120",  # seventy-five move rule
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    ]
+    for fen in fens:
+        engine = GameEngine()
+        engine.board = chess.Board(fen)
+        assert engine.get_state() == legacy_get_state(engine.board), fen
+
+def test_session_managers_share_one_redis_pool():
+    first, second = GameService(), GameService()
+    assert first.session_manager.redis is second.session_manager.redis
+    assert first.session_manager.redis.connection_pool.max_connections == get_settings().REDIS_MAX_CONNECTIONS
+
+@pytest.mark.asyncio
+async def test_concurrent_moves_apply_once(fake_redis):
+    service = GameService()
+    await service.create_game("cas")
+    await service.join_game("cas", 1)
+    await service.join_game("cas", 2)
+
+    # White sends two moves at once: exactly one is applied, the other sees Black to move
+    results = await asyncio.gather(service.make_move("cas", "e2e4", 1), service.make_move("cas", "d2d4", 1),
+                                   return_exceptions=True)
+    applied = [r for r in results if not isinstance(r, Exception)]
+    rejected = [r for r in results if isinstance(r, MoveError)]
+    assert len(applied) == 1 and len(rejected) == 1
+    assert str(rejected[0]) == "Not your turn"
+
+    state = await service.get_game_state("cas")
+    assert state.version == applied[0].version == 3
+    moves = await service.get_moves("cas")
+    assert [(m.ply, m.uci) for m in moves] == [(1, applied[0].last_move)]
+    # A write based on an old version is refused
+    assert not await service.session_manager.compare_and_set("cas", state, 2)
+    with pytest.raises(MoveError):
+        await service.make_move("cas", "e7e5", 1)
+
+@pytest.mark.asyncio
+async def test_game_actor_orders_commands_and_keeps_live_board(fake_redis, monkeypatch):
+    monkeypatch.setattr(game_actor.settings, "GAME_ACTOR_IDLE_SECONDS", 0.05)
+    broadcasts = []
+    async def record(game_id, state):
+        broadcasts.append(state.version)
+    GameActors.on_change(record)
+
+    await GameService().create_game("actor")
+    actor = GameActors.get("actor")
+    await actor.join(1)
+    await actor.join(2)
+    # Sent together, applied in arrival order
+    await asyncio.gather(actor.move("e2e4", 1), actor.move("e7e5", 2), actor.move("g1f3", 1))
+    assert broadcasts == [3, 4, 5]
+    _, board = HotGames.get("actor")
+    assert [m.uci() for m in board.move_stack] == ["e2e4", "e7e5", "g1f3"]
+
+    # Idle actors are evicted
+    await asyncio.sleep(0.1)
+    assert GameActors.get("actor") is not actor
+    GameActors.on_change(None)
+    await GameActors.stop()
+
+@pytest.mark.asyncio
+async def test_pondering_bot_game_keeps_its_live_board(fake_redis, monkeypatch):
+    monkeypatch.setattr(game_service.settings, "BOT_PONDER", True)
+    service = GameService()
+    await service.create_game("ponder-hot", is_bot_game=True, difficulty="medium")
+    await service.join_game("ponder-hot", 1)
+    await service.make_move("ponder-hot", "e2e4", 1)
+    state = await service.make_bot_move("ponder-hot")
+    BotSearchPool.stop_ponder("ponder-hot")
+
+    async def no_reads(game_id):
+        pytest.fail("game read from Redis")
+    monkeypatch.setattr(service.session_manager, "get_game", no_reads)
+    reply = next(iter(chess.Board(state.fen).legal_moves)).uci()
+    await service.make_move("ponder-hot", reply, 1)
+    _, board = HotGames.get("ponder-hot")
+    assert [m.uci() for m in board.move_stack] == ["e2e4", state.last_move, reply]
+
+@pytest.mark.asyncio
+async def test_game_ended_by_the_bot_is_finished_once(fake_redis, monkeypatch):
+    finished = []
+    async def finish_game(self, game_id, state):
+        finished.append(game_id)
+    monkeypatch.setattr(GameService, "finish_game", finish_game)
+    service = GameService()
+    state = await service.create_game("bot-mates", is_bot_game=True, difficulty="medium")
+    # Black mates with Qh4
+    state.fen = "rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq g3 0 2"
+    state.turn, state.white_player_id = 'b', 1
+    await service.session_manager.save_game("bot-mates", state)
+    HotGames.clear()
+
+    actor = GameActors.get("bot-mates")
+    over = await actor.bot_turn()
+    assert over.is_game_over and over.winner == 'b'
+    # The actor finishes the game as its next command
+    await actor.post(lambda: asyncio.sleep(0))
+    assert finished == ["bot-mates"]
+    await GameActors.stop()
+
+@pytest.mark.asyncio
+async def test_hot_game_cache_recovers_from_other_workers_moves(fake_redis):
+    service = GameService()
+    await service.create_game("hot")
+    await service.join_game("hot", 1)
+    await service.join_game("hot", 2)
+    await service.make_move("hot", "e2e4", 1)
+    cached, _ = HotGames.get("hot")
+
+    # Another worker plays Black's reply; this worker's copy is now stale
+    other = chess.Board(cached.fen)
+    other.push_uci("e7e5")
+    engine = GameEngine()
+    engine.board = other
+    reply = engine.get_state()
+    reply.white_player_id, reply.black_player_id = 1, 2
+    assert await service.session_manager.compare_and_set("hot", reply, cached.version)
+
+    # Rejected against the stale copy, accepted after the re-read
+    state = await service.make_move("hot", "g1f3", 1)
+    assert state.version == reply.version + 1 and state.turn == 'b'
+
+    # Published versions only drop older copies
+    HotGames.invalidate("hot", state.version)
+    assert HotGames.get("hot") is not None
+    HotGames.invalidate("hot", state.version + 1)
+    assert HotGames.get("hot") is None
+    # A read that started before the invalidation does not bring the old state back
+    HotGames.put("hot", state)
+    assert HotGames.get("hot") is None
+
+@pytest.mark.asyncio
+async def test_hot_game_cache_keeps_the_newest_version(fake_redis):
+    service = GameService()
+    await service.create_game("newest")
+    old = await service.get_game_state("newest")
+    state = await service.join_game("newest", 1)
+    # A slow read finishing after the save
+    HotGames.put("newest", old)
+    assert HotGames.get("newest")[0].version == state.version
+
+def test_binary_state_record_round_trips_and_reads_json():
+    board = chess.Board("r3k2r/1P3ppp/8/8/8/8/5PPP/R3K2R w KQkq - 0 1")
+    board.push_uci("b7b8q")
+    engine = GameEngine()
+    engine.board = board
+    state = engine.get_state()
+    state.white_player_id, state.black_player_id = 123456789, -1
+    state.difficulty, state.version = "hard", 42
+
+    record = encode_state(state)
+    assert decode_state(record) == state
+    assert len(record) < len(state.model_dump_json()) / 3
+    # Records written as JSON before the binary format still load
+    assert decode_state(state.model_dump_json().encode()) == state
+
+def test_move_applied_delta_is_small_and_carries_ply():
+    engine = GameEngine()
+    for uci in ["e2e4", "e7e5", "g1f3"]:
+        engine.make_move(uci)
+    state = engine.get_state()
+    state.version = 7
+
+    delta = move_applied_payload("g", state)
+    assert delta["uci"] == "g1f3" and delta["ply"] == 3
+    assert delta["base_version"] == 6 and delta["fen"] == state.fen
+    assert "legal_moves" not in delta
+    assert len(json.dumps(delta)) < len(state.model_dump_json())
+
+@pytest.mark.asyncio
+async def test_resume_replays_missed_moves_or_sends_full_state(fake_redis, monkeypatch):
+    service = GameService()
+    await service.create_game("res")
+    await service.join_game("res", 1)
+    seated = await service.join_game("res", 2)
+    for uci, user_id in [("e2e4", 1), ("e7e5", 2), ("g1f3", 1)]:
+        state = await service.make_move("res", uci, user_id)
+
+    # Disconnected right after the seats were taken: replay all three moves
+    event, payload = await resume_reply("res", seated.version, 0)
+    assert event == "moves_resumed"
+    assert payload["moves"] == ["e2e4", "e7e5", "g1f3"]
+    assert payload["base_version"] == seated.version and payload["version"] == state.version
+    assert payload["fen"] == state.fen and payload["black_player_id"] == 2
+
+    # Up to date: nothing to replay
+    event, payload = await resume_reply("res", state.version, 3)
+    assert event == "moves_resumed" and payload["moves"] == []
+
+    # Unknown, impossible or too old positions get the full state
+    assert (await resume_reply("res", None, None))[0] == "game_state"
+    assert (await resume_reply("res", state.version + 1, 3))[0] == "game_state"
+    assert (await resume_reply("res", seated.version, 5))[0] == "game_state"
+    monkeypatch.setattr(socket_events.settings, "RESUME_MAX_MOVES", 2)
+    assert (await resume_reply("res", seated.version, 0))[0] == "game_state"
+    assert await resume_reply("missing", 0, 0) is None
+
+def test_msgpack_game_events_round_trip_and_use_their_own_rooms():
+    engine = GameEngine()
+    engine.make_move("e2e4")
+    full = engine.get_state().model_dump()
+
+    packed = encode_payload(full, binary=True)
+    assert msgpack.unpackb(packed) == full
+    assert len(packed) < len(json.dumps(full))
+    assert encode_payload(full, binary=False) is full
+    assert full_room("g", binary=True) != full_room("g") and delta_room("g", binary=True) != delta_room("g")
+
+@pytest.mark.asyncio
+async def test_finished_games_are_recorded_from_the_result_queue(fake_redis, monkeypatch):
+    recorded, failing = [], set()
+
+    async def finalize_games(db, results, rate):
+        if failing & {r.game_id for r in results}:
+            raise RuntimeError("database unavailable")
+        recorded.append([r.game_id for r in results])
+        return results
+
+    monkeypatch.setattr(result_queue.game_history_crud, "finalize_games", finalize_games)
+    monkeypatch.setattr(result_queue.settings, "RESULT_QUEUE_RETRY_MS", 0)
+    service = GameService()
+    await GameResults._create_group()
+
+    # Bot games are not rated and never queued
+    bot_over = GameEngine().get_state().model_copy(update={"is_game_over": True, "winner": 'w',
+                                                         "white_player_id": 1, "black_player_id": -1})
+    await service.finish_game("bot", bot_over)
+    over = bot_over.model_copy(update={"black_player_id": 2})
+    for game_id in ("a", "b"):
+        await service.finish_game(game_id, over)
+    assert await GameResults.process_once(block_ms=10) == 2
+    assert recorded == [["a", "b"]]
+    assert await fake_redis.xlen(result_queue.RESULTS_STREAM) == 0
+
+    # A failed batch stays pending and is retried entry by entry until it goes to the dead letters
+    failing.add("c")
+    await service.finish_game("c", over)
+    await service.finish_game("d", over)
+    await GameResults.process_once(block_ms=10)
+    assert recorded == [["a", "b"]]
+    await GameResults.process_once(block_ms=10)
+    assert recorded == [["a", "b"], ["d"]]
+    for _ in range(get_settings().RESULT_QUEUE_MAX_ATTEMPTS):
+        await GameResults.process_once(block_ms=10)
+    dead = await fake_redis.xrange(result_queue.DEAD_RESULTS_STREAM)
+    assert [fields[b"game_id"] for _, fields in dead] == [b"c"]
+    assert await fake_redis.xlen(result_queue.RESULTS_STREAM) == 0
+
+@pytest.mark.asyncio
+async def test_disconnect_during_bot_search_keeps_the_bot_move(fake_redis, monkeypatch):
+    monkeypatch.setattr(game_actor.settings, "BOT_MIN_REPLY_MS", 0)
+    service = GameService()
+    await service.create_game("bot-drop", is_bot_game=True, difficulty="medium")
+    actor = GameActors.get("bot-drop")
+    await actor.join(1)
+    await actor.move("e2e4", 1)
+
+    # The only player drops while the bot is searching
+    while "bot-drop" not in BotSearchPool._jobs:
+        await asyncio.sleep(0.001)
+    monkeypatch.setattr(socket_events.sio, "rooms", lambda sid: [sid, "bot-drop"])
+    monkeypatch.setattr(socket_events.sio.manager, "get_participants", lambda namespace, room: iter([("sid", "sid")]))
+    await socket_events.disconnect("sid")
+
+    for _ in range(100):
+        state = await service.get_game_state("bot-drop")
+        if state.turn == 'w':
+            break
+        await asyncio.sleep(0.05)
+    assert state.turn == 'w' and state.last_move != "e2e4"
+    await GameActors.stop()
+
+@pytest.mark.asyncio
+async def test_broken_bot_pool_is_replaced_and_keeps_its_slots(monkeypatch):
+    monkeypatch.setattr(bot_pool.settings, "BOT_POOL_WORKERS", 1)
+    BotSearchPool.start()
+    try:
+        broken, slots = BotSearchPool.executor, BotSearchPool._slots
+        # Start the worker process, then kill it as the OOM killer would
+        await asyncio.get_running_loop().run_in_executor(broken, int)
+        for process in list(broken._processes.values()):
+            process.kill()
+        await asyncio.sleep(0.5)
+
+        limits = DIFFICULTY_LEVELS["easy"]
+        with pytest.raises(BotPoolUnavailable):
+            await BotSearchPool.search("broken", chess.STARTING_FEN, limits)
+        assert BotSearchPool.executor is not broken and BotSearchPool._slots is slots
+        assert slots._value == get_settings().BOT_POOL_MAX_PENDING
+        result = await BotSearchPool.search("broken", chess.STARTING_FEN, limits)
+        assert result.best_move is not None
+    finally:
+        await BotSearchPool.stop()
+        BotSearchPool._slots = None
+
+@pytest.mark.asyncio
+async def test_finished_game_tables_are_freed_by_the_next_search():
+    from app.services import transposition_table
+    transposition_table.get_game_table("finished")
+    BotSearchPool.discard("finished")
+    # Without worker processes the job runs here, with the same tables
+    await BotSearchPool.search("other", chess.STARTING_FEN, DIFFICULTY_LEVELS["easy"])
+    assert "finished" not in transposition_table._game_tables
+    assert "other" in transposition_table._game_tables
+
+@pytest.mark.asyncio
+async def test_overloaded_pool_falls_back_to_a_tiny_search(fake_redis, monkeypatch):
+    async def overloaded(*args, **kwargs):
+        raise BotPoolUnavailable("Bot search queue is full")
+    monkeypatch.setattr(BotSearchPool, "search", overloaded)
+    service = GameService()
+    await service.create_game("fallback", is_bot_game=True, difficulty="hard")
+    await service.join_game("fallback", 1)
+    await service.make_move("fallback", "e2e4", 1)
+
+    state = await service.make_bot_move("fallback")
+    assert state.turn == 'w' and state.last_move is not None
+
+@pytest.mark.asyncio
+async def test_ponder_waits_for_an_idle_worker():
+    search = asyncio.create_task(BotSearchPool.search("busy", chess.STARTING_FEN, DIFFICULTY_LEVELS["hard"]))
+    while BotSearchPool._running == 0:
+        await asyncio.sleep(0.001)
+    # The only worker is taken by a real search
+    BotSearchPool.start_ponder("busy-ponder", chess.STARTING_FEN, DIFFICULTY_LEVELS["hard"])
+    assert "busy-ponder" not in BotSearchPool._ponders
+    search.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await search
+    assert BotSearchPool._running == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_search_stops_in_its_worker(monkeypatch):
+    monkeypatch.setattr(bot_pool.settings, "BOT_POOL_WORKERS", 1)
+    BotSearchPool.start()
+    try:
+        limits = DIFFICULTY_LEVELS["easy"]
+        await BotSearchPool.search("warm-up", chess.STARTING_FEN, limits)
+        # E.g. the game's actor stopped while the bot was thinking
+        long = SearchLimits(max_depth=64, max_nodes=None, time_limit_ms=30000)
+        search = asyncio.create_task(BotSearchPool.search("cancelled", chess.STARTING_FEN, long))
+        while "cancelled" not in BotSearchPool._jobs:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.2)
+        search.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await search
+        # The only worker is free again long before the cancelled search's budget
+        await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(BotSearchPool.executor, int), 2)
+    finally:
+        await BotSearchPool.stop()
+        BotSearchPool._slots = None
+
+@pytest.mark.asyncio
+async def test_real_search_stops_the_ponder_in_its_worker(monkeypatch):
+    monkeypatch.setattr(bot_pool.settings, "BOT_POOL_WORKERS", 1)
+    BotSearchPool.start()
+    try:
+        limits = DIFFICULTY_LEVELS["easy"]
+        await BotSearchPool.search("warm-up", chess.STARTING_FEN, limits)
+        BotSearchPool.start_ponder("pondering", chess.STARTING_FEN, SearchLimits(max_depth=64, max_nodes=None,
+                                                                                  time_limit_ms=30000))
+        while BotSearchPool._running == 0:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.2)
+        # Times out with BotPoolUnavailable if the ponder keeps the worker busy
+        result = await BotSearchPool.search("real", chess.STARTING_FEN, limits)
+        assert result.best_move is not None
+        assert "pondering" not in BotSearchPool._ponders
+    finally:
+        await BotSearchPool.stop()
+        BotSearchPool._slots = None
@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import quote
+import pytest
+from fastapi import HTTPException
+from app.core import security
+from app.core.security import validate_init_data
+
+def sign(auth_date: int, user: dict) -> str:
+    """initData as Telegram builds it, signed with the configured bot token."""
+    fields = {"auth_date": str(auth_date), "user": json.dumps(user)}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", security.settings.TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return "&".join(f"{k}={quote(v)}" for k, v in fields.items())
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    security._validated.clear()
+    yield
+    security._validated.clear()
+
+def test_valid_init_data_is_cached_until_ttl(monkeypatch):
+    now = time.time()
+    init_data = sign(int(now), {"id": 7, "first_name": "A"})
+    assert validate_init_data(init_data)["id"] == 7
+    assert len(security._validated) == 1
+
+    # A cache hit does not verify the signature again
+    monkeypatch.setattr(security.hmac, "new", lambda *args: pytest.fail("signature recomputed"))
+    user = validate_init_data(init_data)
+    user["id"] = 8
+    assert validate_init_data(init_data)["id"] == 7
+
+    monkeypatch.setattr(security.time, "time", lambda: now + security.settings.INIT_DATA_CACHE_TTL + 1)
+    with pytest.raises(pytest.fail.Exception):
+        validate_init_data(init_data)
+
+def test_cached_hash_does_not_validate_other_data():
+    init_data = sign(int(time.time()), {"id": 7, "first_name": "A"})
+    validate_init_data(init_data)
+    forged = init_data.replace("%22id%22%3A%207", "%22id%22%3A%201")
+    assert forged != init_data
+    with pytest.raises(HTTPException) as error:
+        validate_init_data(forged)
+    assert error.value.status_code == 403
+
+def test_init_data_older_than_max_age_is_rejected(monkeypatch):
+    monkeypatch.setattr(security.settings, "INIT_DATA_MAX_AGE", 60)
+    with pytest.raises(HTTPException) as error:
+        validate_init_data(sign(int(time.time()) - 61, {"id": 7}))
+    assert error.value.status_code == 401
+
+    # Cached entries expire with their auth_date too
+    init_data = sign(int(time.time()) - 50, {"id": 7})
+    validate_init_data(init_data)
+    assert security._validated[init_data.rsplit("hash=", 1)[1]][2] <= time.time() + 10
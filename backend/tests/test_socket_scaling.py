@@ -0,0 +1,114 @@
+"""
+Two server processes sharing Socket.IO rooms through Redis (SOCKETIO_REDIS_MANAGER).
+Needs a Redis server at REDIS_URL; skipped otherwise.
+"""
+import hashlib
+import hmac
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+import pytest
+import redis
+import requests
+import socketio
+from app.core.config import get_settings
+
+settings = get_settings()
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_TOKEN = "123456:scaling-test"
+
+# Runs the app without the Telegram bot, which would need network access to Telegram
+LAUNCHER = """
+import sys, uvicorn
+from app.services.telegram_bot import TelegramService
+async def skip():
+    pass
+TelegramService.start_bot = skip
+TelegramService.stop_bot = skip
+from app.main import app
+uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+def redis_available() -> bool:
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+pytestmark = pytest.mark.skipif(not redis_available(), reason="Redis server not reachable at REDIS_URL")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def init_data(user_id: int) -> str:
+    """Telegram WebApp initData signed with BOT_TOKEN."""
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id, "first_name": f"P{user_id}"})}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return "&".join(f"{k}={quote(v)}" for k, v in fields.items())
+
+@pytest.fixture
+def workers():
+    env = dict(os.environ, SOCKETIO_REDIS_MANAGER="true", TELEGRAM_BOT_TOKEN=BOT_TOKEN,
+               SECRET_KEY="scaling-test", BOT_POOL_WORKERS="0")
+    ports = [free_port(), free_port()]
+    processes = [subprocess.Popen([sys.executable, "-c", LAUNCHER, str(port)], cwd=BACKEND_DIR, env=env)
+                 for port in ports]
+    try:
+        for port in ports:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    if time.time() > deadline:
+                        raise
+                    time.sleep(0.2)
+        yield [f"http://127.0.0.1:{port}" for port in ports]
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+def test_room_broadcast_reaches_clients_on_other_worker(workers):
+    worker_a, worker_b = workers
+    game_id = requests.post(f"{worker_a}/api/v1/game/create", params={"type": "online"}).json()["game_id"]
+
+    joined = {"white": threading.Event(), "black": threading.Event()}
+    received = threading.Event()
+    white, black = socketio.Client(), socketio.Client()
+
+    @white.on("game_state")
+    def on_white_state(data):
+        joined["white"].set()
+
+    @black.on("game_state")
+    def on_black_state(data):
+        joined["black"].set()
+        if data.get("last_move") == "e2e4":
+            received.set()
+
+    white.connect(worker_a, transports=["polling"], auth={"initData": init_data(1001)})
+    black.connect(worker_b, transports=["polling"], auth={"initData": init_data(1002)})
+    try:
+        white.emit("join_room", {"room": game_id})
+        black.emit("join_room", {"room": game_id})
+        assert joined["white"].wait(10) and joined["black"].wait(10)
+        white.emit("make_move", {"game_id": game_id, "uci": "e2e4"})
+        # Applied and broadcast by worker A, delivered by worker B
+        assert received.wait(10)
+    finally:
+        white.disconnect()
+        black.disconnect()
@@ -0,0 +1,60 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import object_session
+from app.core.config import get_settings
+from app.models.user import User
+from app.services.user_cache import UserCache
+
+@pytest.fixture
+def db():
+    """A session that fails the test if it ever talks to the database."""
+    engine = create_async_engine(get_settings().DATABASE_URL)
+    event.listen(engine.sync_engine, "connect", lambda *args: pytest.fail("database used"))
+    return AsyncSession(engine)
+
+@pytest.fixture(autouse=True)
+def empty_local_cache():
+    UserCache.clear()
+    yield
+    UserCache.clear()
+
+def make_user() -> User:
+    return User(id=5, telegram_id=42, first_name="Ann", elo=1100, games_played=3, wins=2, losses=1, draws=0,
+                is_premium=True, premium_tier="basic", premium_expires_at=datetime(2030, 1, 2, 3, 4),
+                balance=0, level=1, xp=10, preferred_language="de")
+
+@pytest.mark.asyncio
+async def test_cached_user_is_attached_without_a_query(fake_redis, db):
+    await UserCache.put(make_user(), 0)
+    # Only Redis left: as seen by another worker
+    UserCache.clear()
+
+    user = await UserCache.get(db, 42)
+    assert object_session(user) is db.sync_session
+    assert (user.id, user.elo, user.preferred_language) == (5, 1100, "de")
+    assert user.premium_expires_at == datetime(2030, 1, 2, 3, 4)
+    # Nothing is pending: only later changes would be written
+    assert not db.dirty and not db.new
+    user.preferred_language = "fr"
+    assert user in db.dirty
+
+@pytest.mark.asyncio
+async def test_invalidated_user_is_read_from_the_database_again(fake_redis, db):
+    await UserCache.put(make_user(), 0)
+    await UserCache.invalidate(42)
+    assert await UserCache.get(db, 42) is None
+    assert await fake_redis.get("user:42") is None
+
+@pytest.mark.asyncio
+async def test_read_that_raced_an_invalidation_is_not_cached(fake_redis, db):
+    # Loaded from the database before another worker committed and invalidated the user
+    generation = await UserCache.generation(42)
+    await UserCache.invalidate(42)
+    await UserCache.put(make_user(), generation)
+    assert await fake_redis.get("user:42") is None
+    assert await UserCache.get(db, 42) is None
+
+    await UserCache.put(make_user(), await UserCache.generation(42))
+    assert (await UserCache.get(db, 42)).elo == 1100
@@ -1,21 +1,43 @@
-import { useEffect, useState, useCallback } from "react";
-import { getSocket } from "@/lib/socket";
+import { useEffect, useState, useCallback, useRef } from "react";
+import { getSocket, decodePayload } from "@/lib/socket";
 import { Chess, Move } from "chess.js";
 
+// Half-moves played to reach a FEN (games start from the initial position)
+const plyOf = (fen: string) => {
+    const [, turn, , , , fullmove] = fen.split(" ");
+    return (Number(fullmove) - 1) * 2 + (turn === "b" ? 1 : 0);
+};
+
+// Board, side to move and castling rights; en passant notation differs between libraries
+const samePosition = (a: string, b: string) => a.split(" ").slice(0, 3).join(" ") === b.split(" ").slice(0, 3).join(" ");
+
 export const useGameSocket = (gameId: string) => {
     const [fen, setFen] = useState("start");
     const [chess] = useState(new Chess());
     const [isConnected, setIsConnected] = useState(false);
     const [error, setError] = useState<string | null>(null);
     const [gameState, setGameState] = useState<any>(null);
+    // Version of the last state applied; deltas must build on exactly this version
+    const versionRef = useRef<number | null>(null);
+    // FEN of that state (the board may also hold an optimistic move)
+    const serverFenRef = useRef<string | null>(null);
 
     useEffect(() => {
         const socket = getSocket();
 
-        const onConnect = () => setIsConnected(true);
+        const onConnect = () => {
+            setIsConnected(true);
+            if (versionRef.current === null || serverFenRef.current === null) {
+                socket.emit("join_room", { room: gameId });
+            } else {
+                // Reconnected: fetch only what was missed while offline
+                socket.emit("resume", { game_id: gameId, version: versionRef.current, ply: plyOf(serverFenRef.current) });
+            }
+        };
         const onDisconnect = () => setIsConnected(false);
 
-        const onGameState = (data: any) => {
+        const onGameState = (payload: any) => {
+            const data = decodePayload(payload);
             console.log("Game State Received:", data);
             setGameState(data);
             setFen(data.fen);
@@ -24,6 +46,81 @@ export const useGameSocket = (gameId: string) => {
             } catch (e) {
                 console.error("Invalid FEN:", data.fen);
             }
+            versionRef.current = data.version;
+            serverFenRef.current = data.fen;
+            // Switch to move_applied deltas from this version on
+            socket.emit("ack_state", { game_id: gameId, version: data.version });
+        };
+
+        const onMoveApplied = (payload: any) => {
+            const data = decodePayload(payload);
+            if (data.game_id !== gameId) return;
+            const version = versionRef.current;
+            // Already have it (e.g. also received as a full state)
+            if (version !== null && data.version <= version) return;
+            if (data.base_version !== version) {
+                // Missed a move: ask for the full state
+                socket.emit("sync", { game_id: gameId });
+                return;
+            }
+            applyServerState(data, { last_move: data.uci });
+        };
+
+        const onMovesResumed = (payload: any) => {
+            const data = decodePayload(payload);
+            if (data.game_id !== gameId) return;
+            const version = versionRef.current;
+            if (version !== null && data.version <= version) return;
+            if (data.base_version !== version) {
+                socket.emit("sync", { game_id: gameId });
+                return;
+            }
+            // Replay the missed moves so the board (and its history) follows them
+            try {
+                chess.load(serverFenRef.current!);
+                for (const uci of data.moves) {
+                    chess.move({ from: uci.slice(0, 2), to: uci.slice(2, 4), promotion: uci[4] });
+                }
+            } catch (e) {
+                console.error("Could not replay moves:", data.moves);
+            }
+            if (!samePosition(chess.fen(), data.fen)) {
+                socket.emit("sync", { game_id: gameId });
+                return;
+            }
+            applyServerState(data, {
+                white_player_id: data.white_player_id,
+                black_player_id: data.black_player_id,
+                ...(data.moves.length ? { last_move: data.moves[data.moves.length - 1] } : {}),
+            });
+        };
+
+        // Position and flags shared by move_applied and moves_resumed; legal moves are recomputed here
+        const applyServerState = (data: any, extra: object) => {
+            try {
+                chess.load(data.fen);
+            } catch (e) {
+                console.error("Invalid FEN:", data.fen);
+                socket.emit("sync", { game_id: gameId });
+                return;
+            }
+            versionRef.current = data.version;
+            serverFenRef.current = data.fen;
+            setFen(data.fen);
+            setGameState((prev: any) => ({
+                ...prev,
+                ...extra,
+                fen: data.fen,
+                turn: chess.turn(),
+                is_check: data.is_check,
+                is_checkmate: data.is_checkmate,
+                is_stalemate: data.is_stalemate,
+                is_game_over: data.is_game_over,
+                winner: data.winner,
+                termination: data.termination,
+                version: data.version,
+                legal_moves: chess.moves({ verbose: true }).map((m: Move) => m.from + m.to + (m.promotion || "")),
+            }));
         };
 
         const onError = (data: { message: string }) => {
@@ -34,21 +131,21 @@ export const useGameSocket = (gameId: string) => {
         socket.on("connect", onConnect);
         socket.on("disconnect", onDisconnect);
         socket.on("game_state", onGameState);
+        socket.on("move_applied", onMoveApplied);
+        socket.on("moves_resumed", onMovesResumed);
         socket.on("error", onError);
 
-        // Join the room
+        // Join the room now, or on (re)connect through onConnect
         if (socket.connected) {
             socket.emit("join_room", { room: gameId });
-        } else {
-            socket.once("connect", () => {
-                socket.emit("join_room", { room: gameId });
-            });
         }
 
         return () => {
             socket.off("connect", onConnect);
             socket.off("disconnect", onDisconnect);
             socket.off("game_state", onGameState);
+            socket.off("move_applied", onMoveApplied);
+            socket.off("moves_resumed", onMovesResumed);
             socket.off("error", onError);
         };
     }, [gameId, chess]);
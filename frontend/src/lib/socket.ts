@@ -1,4 +1,5 @@
 import io from "socket.io-client";
+import { decode } from "@msgpack/msgpack";
 
 // Prevent multiple connections
 let socket: ReturnType<typeof io>;
@@ -21,7 +22,9 @@ export const getSocket = () => {
             path: "/socket.io/", // Standard Socket.IO path
             reconnectionAttempts: 5,
             auth: {
-                initData: initData
+                initData: initData,
+                // Game events arrive msgpack-encoded when the server supports it
+                encoding: "msgpack"
             }
         });
 
@@ -35,3 +38,7 @@ export const getSocket = () => {
     }
     return socket;
 };
+
+// Game event payloads are msgpack binary for clients that negotiated it and plain JSON otherwise
+export const decodePayload = (data: any) =>
+    data instanceof ArrayBuffer || ArrayBuffer.isView(data) ? (decode(data) as any) : data;